@@ -2,8 +2,9 @@
 Configuração da aplicação AutoLav Backend
 """
 import os
+from functools import lru_cache
 from pathlib import Path
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -15,6 +16,7 @@ class Settings(BaseSettings):
     
     # Segurança
     api_token: str = "change_me_in_production"
+    cors_origins: list[str] = ["http://localhost:5173", "http://localhost:3000"]
     
     # Diretórios
     storage_dir: Path = Path("./storage")
@@ -23,7 +25,9 @@ class Settings(BaseSettings):
     
     # Scraping
     max_concurrency: int = 4
-    nav_timeout: int = 30
+    selector_timeout_ms: int = 3000
+    goto_timeout_ms: int = 15000
+    unit_total_timeout: int = 120
     nav_delay: int = 500
     max_retries: int = 2
     
@@ -35,16 +39,25 @@ class Settings(BaseSettings):
     login_username: str = ""
     login_password: str = ""
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = False
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        frozen=True,
+        extra="ignore"
+    )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Retorna a instância única de configuração (lê o .env uma só vez)"""
+    return Settings()
 
 
 # Instância global de configuração
-settings = Settings()
+settings = get_settings()
 
 # Criar diretórios necessários
-settings.storage_dir.mkdir(parents=True, exist_ok=True)
-settings.log_dir.mkdir(parents=True, exist_ok=True)
-settings.reports_dir.mkdir(parents=True, exist_ok=True)
+for _directory in (settings.storage_dir, settings.log_dir, settings.reports_dir):
+    if not _directory.exists():
+        _directory.mkdir(parents=True, exist_ok=True)
@@ -1,13 +1,84 @@
 """
 Sistema de logging para AutoLav
 """
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
+from typing import Dict
 from .config import settings
 
 
+# Listeners ativos por logger (escrevem os registros fora do event loop)
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+
+
+class BufferedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    TimedRotatingFileHandler com buffer de bloco: acumula registros e só
+    descarrega no disco por intervalo de tempo ou quando chega um WARNING
+    ou superior
+    
+    Uma thread de fundo descarrega o buffer a cada flush_interval, para que os
+    últimos registros de uma rajada não fiquem presos até o próximo log.
+    """
+    
+    def __init__(self, filename, buffer_size: int = 65536, flush_interval: float = 1.0, **kwargs):
+        # Definidos antes do super().__init__, que já chama _open() quando delay=False
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._urgent = False
+        self._pending = False
+        self._closing = threading.Event()
+        super().__init__(filename, **kwargs)
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, name="autolav-log-flush", daemon=True
+        )
+        self._flusher.start()
+    
+    def _open(self):
+        """Abre o arquivo com buffer de bloco em vez do padrão por linha"""
+        return open(
+            self.baseFilename, self.mode, buffering=self.buffer_size,
+            encoding=self.encoding, errors=self.errors
+        )
+    
+    def emit(self, record: logging.LogRecord):
+        self._urgent = record.levelno >= logging.WARNING
+        self._pending = True
+        super().emit(record)
+    
+    def flush(self):
+        """Descarrega apenas para registros urgentes ou após flush_interval"""
+        now = time.monotonic()
+        if self._urgent or now - self._last_flush >= self.flush_interval:
+            self._flush_now(now)
+    
+    def _flush_now(self, now: float):
+        super().flush()
+        self._last_flush = now
+        self._urgent = False
+        self._pending = False
+    
+    def _flush_periodically(self):
+        """Descarrega o que sobrou no buffer quando não chegam novos registros"""
+        while not self._closing.wait(self.flush_interval):
+            if not self._pending:
+                continue
+            with self.lock:
+                if self._pending and self.stream:
+                    self._flush_now(time.monotonic())
+    
+    def close(self):
+        self._closing.set()
+        super().close()
+
+
 def setup_logger(name: str = "autolav") -> logging.Logger:
     """Configura e retorna um logger"""
     
@@ -28,17 +99,85 @@ def setup_logger(name: str = "autolav") -> logging.Logger:
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
     
-    # Handler para arquivo
-    log_file = settings.log_dir / f"autolav_{datetime.now().strftime('%Y%m%d')}.log"
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    # Handler para arquivo (rotação diária; só abre o arquivo no primeiro registro)
+    file_handler = BufferedRotatingFileHandler(
+        settings.log_dir / "autolav.log", when='midnight', encoding='utf-8', delay=True
+    )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    
+    # Os handlers reais rodam numa thread de fundo; o logger só enfileira
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    listener.start()
+    _listeners[name] = listener
     
     return logger
 
 
+class _ForwardHandler(logging.Handler):
+    """Entrega os registros recebidos de outro processo a um logger local"""
+    
+    def __init__(self, target: logging.Logger):
+        super().__init__()
+        self._target = target
+    
+    def emit(self, record: logging.LogRecord):
+        self._target.handle(record)
+
+
+def forward_logs_from(log_queue, name: str = "autolav") -> logging.handlers.QueueListener:
+    """
+    Repassa ao logger deste processo os registros enviados por processos filhos
+    
+    Args:
+        log_queue: multiprocessing.Queue compartilhada com os filhos
+        name: Nome do logger de destino
+    
+    Returns:
+        Listener já iniciado; chame stop() depois que os filhos terminarem
+    """
+    listener = logging.handlers.QueueListener(log_queue, _ForwardHandler(logging.getLogger(name)))
+    listener.start()
+    return listener
+
+
+def log_to_queue(log_queue, name: str = "autolav"):
+    """
+    Num processo filho, troca os handlers locais por um QueueHandler para o pai
+    
+    Assim só o processo pai escreve (e rotaciona) o arquivo de log.
+    
+    Args:
+        log_queue: multiprocessing.Queue compartilhada com o processo pai
+        name: Nome do logger a redirecionar
+    """
+    listener = _listeners.pop(name, None)
+    if listener:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    
+    logger = logging.getLogger(name)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+
+def shutdown_logger():
+    """Descarrega as filas pendentes e encerra as threads de logging"""
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+
+atexit.register(shutdown_logger)
+
+
 # Logger global
 logger = setup_logger()
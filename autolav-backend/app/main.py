@@ -2,36 +2,73 @@
 AutoLav Backend - API FastAPI
 """
 import asyncio
-import json
+import aiofiles
+import anyio
+import orjson
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional, TYPE_CHECKING
 from fastapi import FastAPI, HTTPException, Header, UploadFile, File, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from .config import settings
-from .logger import logger
+from .logger import logger, shutdown_logger
 from .models import (
     ScrapeRequest, ScrapeResponse, UnitResult, RowData,
     DiscoverUnitsResponse, UnitInfo, LoginCredentials, HealthResponse
 )
-from .scraper import LavanderiaPortalScraper
 from .parser import validate_date_range
 
+if TYPE_CHECKING:
+    # Playwright é pesado: o scraper só é importado quando um endpoint precisa dele
+    from .scraper import LavanderiaPortalScraper
+
 # Versão da aplicação
 VERSION = "1.0.0"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização e encerramento da aplicação"""
+    from .scraper import LavanderiaPortalScraper
+    
+    logger.info(f"AutoLav Backend v{VERSION} iniciado")
+    logger.info(f"Porta: {settings.port}")
+    logger.info(f"Max concurrency: {settings.max_concurrency}")
+    logger.info(
+        f"Timeouts: seletor {settings.selector_timeout_ms}ms, "
+        f"goto {settings.goto_timeout_ms}ms, unidade {settings.unit_total_timeout}s"
+    )
+    
+    # Pré-aquece o browser compartilhado; a referência deste scraper o mantém
+    # aberto entre requisições, então o primeiro scraping não paga o launch
+    warm_scraper = LavanderiaPortalScraper()
+    try:
+        await warm_scraper.start()
+    except Exception as e:
+        logger.warning(f"Falha ao pré-aquecer o browser, a primeira requisição o iniciará: {e}")
+    
+    yield
+    
+    await warm_scraper.close()
+    logger.info("AutoLav Backend encerrado")
+    shutdown_logger()
+
+
 # Criar app FastAPI
 app = FastAPI(
     title="AutoLav API",
     description="API para automação de coleta de dados de lavanderia hospitalar",
-    version=VERSION
+    version=VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Em produção, especifique os domínios permitidos
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -91,6 +128,24 @@ async def get_login_status():
     }
 
 
+def validate_storage_state(content: bytes):
+    """
+    Valida o conteúdo de um storage_state.json do Playwright
+    
+    Raises:
+        HTTPException 400 se não for um objeto JSON com 'cookies'/'origins' em lista
+    """
+    try:
+        storage_state = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="JSON inválido")
+    
+    if not isinstance(storage_state, dict) or not all(
+        isinstance(storage_state.get(key, []), list) for key in ('cookies', 'origins')
+    ):
+        raise HTTPException(status_code=400, detail="storage_state inválido")
+
+
 @app.post("/api/upload-storage", dependencies=[Depends(verify_token)])
 async def upload_storage_state(file: UploadFile = File(...)):
     """
@@ -105,13 +160,10 @@ async def upload_storage_state(file: UploadFile = File(...)):
         content = await file.read()
         
         # Valida JSON
-        try:
-            json.loads(content)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="JSON inválido")
+        validate_storage_state(content)
         
-        with open(storage_path, 'wb') as f:
-            f.write(content)
+        async with aiofiles.open(storage_path, 'wb') as f:
+            await f.write(content)
         
         logger.info(f"Storage state salvo em {storage_path}")
         
@@ -129,6 +181,8 @@ async def discover_units():
     """
     Descobre automaticamente todas as unidades disponíveis
     """
+    from .scraper import LavanderiaPortalScraper
+    
     try:
         logger.info("Iniciando descoberta de unidades...")
         
@@ -155,8 +209,23 @@ async def discover_units():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def build_unit_result(result: dict) -> UnitResult:
+    """
+    Monta UnitResult a partir do dicionário do scraper sem revalidar cada linha
+    
+    As linhas já saem tipadas de parse_date/parse_kg, então a validação do
+    Pydantic seria apenas custo repetido por linha.
+    """
+    return UnitResult.model_construct(
+        unit_id=result['unit_id'],
+        rows=[RowData.model_construct(**row) for row in result['rows']],
+        total=result['total'],
+        error=result.get('error')
+    )
+
+
 async def scrape_unit_with_retry(
-    scraper: LavanderiaPortalScraper,
+    scraper: "LavanderiaPortalScraper",
     unit_id: str,
     start_date: Optional[str],
     end_date: Optional[str],
@@ -187,7 +256,7 @@ async def scrape_unit_with_retry(
             
             # Se não houve erro, retorna resultado
             if not result.get('error'):
-                return UnitResult(**result)
+                return build_unit_result(result)
             
             last_error = result.get('error')
             
@@ -204,7 +273,96 @@ async def scrape_unit_with_retry(
     )
 
 
-@app.post("/api/scrape", response_model=ScrapeResponse, dependencies=[Depends(verify_token)])
+async def resolve_scrape_request(
+    payload: Optional[str],
+    storage: Optional[UploadFile],
+    request_body: Optional[ScrapeRequest]
+) -> ScrapeRequest:
+    """
+    Extrai o ScrapeRequest do corpo JSON ou do multipart/form-data
+    
+    No multipart, salva o storage_state.json enviado junto.
+    """
+    if payload:
+        # Multipart form data
+        request_data = orjson.loads(payload)
+        request_obj = ScrapeRequest(**request_data)
+        
+        # Salva storage state se fornecido
+        if storage:
+            storage_path = settings.storage_dir / "storage_state.json"
+            content = await storage.read()
+            validate_storage_state(content)
+            async with aiofiles.open(storage_path, 'wb') as f:
+                await f.write(content)
+            logger.info("Storage state recebido via multipart")
+        
+        return request_obj
+    
+    if request_body:
+        # JSON direto
+        return request_body
+    
+    raise HTTPException(status_code=400, detail="Request inválido")
+
+
+def build_scrape_kwargs(request_obj: ScrapeRequest) -> dict:
+    """Normaliza datas e credenciais do request para scrape_unit_with_retry"""
+    # Valida e normaliza datas
+    start_date, end_date = validate_date_range(request_obj.start_date, request_obj.end_date)
+    
+    logger.info(f"Iniciando scraping de {len(request_obj.units)} unidades")
+    logger.info(f"Período: {start_date} a {end_date}")
+    
+    # Obtém credenciais (usa as do request ou as armazenadas)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'username': request_obj.username or _credentials_store.get('username'),
+        'password': request_obj.password or _credentials_store.get('password'),
+        'date_selector': request_obj.date_selector,
+        'kg_selector': request_obj.kg_selector,
+        'max_retries': settings.max_retries
+    }
+
+
+async def run_scrape_pool(
+    scraper: "LavanderiaPortalScraper",
+    units: List[str],
+    on_result: Callable[[int, UnitResult], None],
+    **scrape_kwargs
+):
+    """
+    Faz scraping das unidades com concorrência limitada
+    
+    Um número fixo de workers consome a fila de unidades (sem criar uma task
+    por unidade) e entrega cada resultado a `on_result` junto com o índice da
+    unidade no request, assim que ela termina.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for index, unit_id in enumerate(units):
+        pending.put_nowait((index, unit_id))
+    
+    async def worker():
+        while not pending.empty():
+            index, unit_id = pending.get_nowait()
+            result = await scrape_unit_with_retry(scraper=scraper, unit_id=unit_id, **scrape_kwargs)
+            on_result(index, result)
+            
+            # Delay entre unidades
+            await asyncio.sleep(settings.nav_delay / 1000)
+    
+    async with asyncio.TaskGroup() as task_group:
+        for _ in range(min(settings.max_concurrency, len(units))):
+            task_group.create_task(worker())
+
+
+@app.post(
+    "/api/scrape",
+    response_model=None,
+    responses={200: {"model": ScrapeResponse}},
+    dependencies=[Depends(verify_token)]
+)
 async def scrape_units(
     payload: Optional[str] = Form(None),
     storage: Optional[UploadFile] = File(None),
@@ -215,65 +373,21 @@ async def scrape_units(
     
     Aceita tanto JSON direto quanto multipart/form-data com storage_state.json
     """
+    from .scraper import LavanderiaPortalScraper
+    
     try:
-        # Parse request
-        if payload:
-            # Multipart form data
-            request_data = json.loads(payload)
-            request_obj = ScrapeRequest(**request_data)
-            
-            # Salva storage state se fornecido
-            if storage:
-                storage_path = settings.storage_dir / "storage_state.json"
-                content = await storage.read()
-                with open(storage_path, 'wb') as f:
-                    f.write(content)
-                logger.info("Storage state recebido via multipart")
-        
-        elif request_body:
-            # JSON direto
-            request_obj = request_body
-        
-        else:
-            raise HTTPException(status_code=400, detail="Request inválido")
+        request_obj = await resolve_scrape_request(payload, storage, request_body)
+        scrape_kwargs = build_scrape_kwargs(request_obj)
         
-        # Valida e normaliza datas
-        start_date, end_date = validate_date_range(request_obj.start_date, request_obj.end_date)
+        # Mantém a ordem do request
+        results = [None] * len(request_obj.units)
         
-        # Obtém credenciais (usa as do request ou as armazenadas)
-        username = request_obj.username or _credentials_store.get('username')
-        password = request_obj.password or _credentials_store.get('password')
-        
-        logger.info(f"Iniciando scraping de {len(request_obj.units)} unidades")
-        logger.info(f"Período: {start_date} a {end_date}")
+        def store(index: int, result: UnitResult):
+            results[index] = result
         
         # Cria scraper
         async with LavanderiaPortalScraper() as scraper:
-            # Processa unidades com concorrência limitada
-            semaphore = asyncio.Semaphore(settings.max_concurrency)
-            
-            async def scrape_with_semaphore(unit_id: str):
-                async with semaphore:
-                    result = await scrape_unit_with_retry(
-                        scraper=scraper,
-                        unit_id=unit_id,
-                        start_date=start_date,
-                        end_date=end_date,
-                        username=username,
-                        password=password,
-                        date_selector=request_obj.date_selector,
-                        kg_selector=request_obj.kg_selector,
-                        max_retries=settings.max_retries
-                    )
-                    
-                    # Delay entre unidades
-                    await asyncio.sleep(settings.nav_delay / 1000)
-                    
-                    return result
-            
-            # Executa scraping de todas as unidades
-            tasks = [scrape_with_semaphore(unit_id) for unit_id in request_obj.units]
-            results = await asyncio.gather(*tasks)
+            await run_scrape_pool(scraper, request_obj.units, store, **scrape_kwargs)
         
         # Calcula estatísticas
         successful = sum(1 for r in results if not r.error)
@@ -281,12 +395,13 @@ async def scrape_units(
         
         logger.info(f"Scraping concluído: {successful} sucesso, {failed} falhas")
         
-        return ScrapeResponse(
-            results=results,
-            total_units=len(results),
-            successful_units=successful,
-            failed_units=failed
-        )
+        # Serializa direto, sem revalidar cada linha contra ScrapeResponse
+        return ORJSONResponse(content={
+            'results': [r.model_dump() for r in results],
+            'total_units': len(results),
+            'successful_units': successful,
+            'failed_units': failed
+        })
     
     except HTTPException:
         raise
@@ -295,19 +410,64 @@ async def scrape_units(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Executado ao iniciar a aplicação"""
-    logger.info(f"AutoLav Backend v{VERSION} iniciado")
-    logger.info(f"Porta: {settings.port}")
-    logger.info(f"Max concurrency: {settings.max_concurrency}")
-    logger.info(f"Nav timeout: {settings.nav_timeout}s")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Executado ao desligar a aplicação"""
-    logger.info("AutoLav Backend encerrado")
+@app.post("/api/scrape/stream", dependencies=[Depends(verify_token)])
+async def scrape_units_stream(
+    payload: Optional[str] = Form(None),
+    storage: Optional[UploadFile] = File(None),
+    request_body: Optional[ScrapeRequest] = None
+):
+    """
+    Faz scraping de múltiplas unidades devolvendo NDJSON
+    
+    Cada UnitResult é enviado como uma linha assim que a unidade termina,
+    na ordem de conclusão. Aceita os mesmos formatos de /api/scrape.
+    """
+    from .scraper import LavanderiaPortalScraper
+    
+    try:
+        request_obj = await resolve_scrape_request(payload, storage, request_body)
+        scrape_kwargs = build_scrape_kwargs(request_obj)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro no scraping: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def stream_results():
+        done: asyncio.Queue = asyncio.Queue()
+        scraper = LavanderiaPortalScraper()
+        producer = None
+        
+        async def produce():
+            try:
+                await run_scrape_pool(
+                    scraper, request_obj.units,
+                    lambda index, result: done.put_nowait(result),
+                    **scrape_kwargs
+                )
+            finally:
+                # Sentinela de fim de fila
+                done.put_nowait(None)
+        
+        try:
+            await scraper.start()
+            producer = asyncio.create_task(produce())
+            while (result := await done.get()) is not None:
+                yield result.model_dump_json().encode() + b'\n'
+            await producer
+        finally:
+            # Se o cliente desconecta, o Starlette cancela o stream por um cancel scope
+            # do anyio, que cancelaria também as esperas abaixo: a limpeza roda blindada
+            with anyio.CancelScope(shield=True):
+                if producer is not None and not producer.done():
+                    # Interrompe os workers e espera que soltem as páginas antes de fechar
+                    producer.cancel()
+                    await asyncio.gather(producer, return_exceptions=True)
+                await scraper.close()
+        
+        logger.info(f"Streaming de scraping concluído: {len(request_obj.units)} unidades")
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":
@@ -2,12 +2,96 @@
 Funções de parsing e processamento de dados
 """
 import re
-from datetime import datetime
-from typing import Optional, List, Dict, Any
-from dateutil import parser as date_parser
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Tuple
 from .logger import logger
 
 
+class _KeepTable(dict):
+    """
+    Tabela para str.translate que mantém só os caracteres aceitos por `keep`
+    
+    A decisão de cada caractere é calculada na primeira ocorrência e memorizada,
+    de modo que as chamadas seguintes são resolvidas inteiramente em C.
+    """
+    
+    def __init__(self, keep):
+        super().__init__()
+        self._keep = keep
+    
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        value = codepoint if self._keep(chr(codepoint)) else None
+        self[codepoint] = value
+        return value
+
+
+# Unidades de peso removidas antes de extrair o número
+_KG_UNIT_RE = re.compile(r'\s*(?:kg|quilos?|kilos?)\s*', re.IGNORECASE)
+
+# Mantém apenas dígitos, vírgula, ponto e sinal negativo
+_KG_KEEP_TABLE = _KeepTable(lambda c: c.isdecimal() or c in ',.-')
+
+# Sobras que não formam número depois da limpeza
+_KG_EMPTY_VALUES = frozenset({'-', '.', ','})
+
+# Mantém apenas caracteres de palavra (\w) e hífen em IDs de unidade
+_UNIT_ID_KEEP_TABLE = _KeepTable(lambda c: c.isalnum() or c in '_-')
+
+# Data já no formato ISO enviado pelo frontend
+_ISO_DATE_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+# Formatos numéricos emitidos pelo portal (dd/mm/yyyy, yyyy-mm-dd, dd-mm-yyyy, dd/mm/yy)
+_DATE_RE = re.compile(r'(\d{1,4})[-/](\d{1,2})[-/](\d{1,4})')
+
+
+def _two_digit_year(year: int, this_year: Optional[int] = None) -> int:
+    """Converte ano de 2 dígitos usando a mesma janela de ±50 anos do dateutil"""
+    if this_year is None:
+        this_year = datetime.now().year
+    year += this_year // 100 * 100
+    if year >= this_year + 50:
+        year -= 100
+    elif year < this_year - 50:
+        year += 100
+    return year
+
+
+def _fast_parse_date(text: str, fuzzy: bool = True, this_year: Optional[int] = None) -> Optional[str]:
+    """
+    Tenta extrair a data via regex pré-compilada, sem passar pelo dateutil
+    
+    Args:
+        text: String contendo a data
+        fuzzy: Se True, procura a data em qualquer posição do texto
+        this_year: Ano de referência para anos de 2 dígitos (padrão: ano atual)
+    
+    Returns:
+        Data no formato ISO (YYYY-MM-DD) ou None se o formato não for reconhecido
+    """
+    match = _DATE_RE.search(text) if fuzzy else _DATE_RE.fullmatch(text)
+    if not match:
+        return None
+    
+    first, second, third = match.groups()
+    
+    if len(first) == 4 and len(third) <= 2:
+        year, month, day = int(first), int(second), int(third)
+    elif len(first) <= 2 and len(third) == 4:
+        day, month, year = int(first), int(second), int(third)
+    elif len(first) <= 2 and len(third) == 2:
+        day, month, year = int(first), int(second), _two_digit_year(int(third), this_year)
+    else:
+        return None
+    
+    try:
+        datetime(year, month, day)
+    except ValueError:
+        return None
+    
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
 def parse_kg(text: str) -> Optional[float]:
     """
     Extrai valor numérico de kg de uma string
@@ -25,13 +109,11 @@ def parse_kg(text: str) -> Optional[float]:
         # Remove espaços e converte para string
         text = str(text).strip()
         
-        # Remove unidades comuns
-        text = re.sub(r'\s*(kg|KG|Kg|quilos?|kilos?)\s*', '', text, flags=re.IGNORECASE)
-        
-        # Remove caracteres não numéricos exceto vírgula, ponto e sinal negativo
-        text = re.sub(r'[^\d,.\-]', '', text)
+        # Remove unidades comuns e, numa só passada, caracteres não numéricos
+        # exceto vírgula, ponto e sinal negativo
+        text = _KG_UNIT_RE.sub('', text).translate(_KG_KEEP_TABLE)
         
-        if not text or text in ['-', '.', ',']:
+        if not text or text in _KG_EMPTY_VALUES:
             return None
         
         # Substitui vírgula por ponto (formato brasileiro)
@@ -65,11 +147,28 @@ def parse_date(text: str, fuzzy: bool = True) -> Optional[str]:
     if not text:
         return None
     
+    # O dia atual entra na chave: datas parciais ("15/01") e anos de 2 dígitos
+    # dependem dele, e o cache não pode devolver o ano anterior após a virada
+    return _parse_date_cached(str(text).strip(), fuzzy, date.today())
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_cached(text: str, fuzzy: bool, today: date) -> Optional[str]:
+    """
+    Parsing efetivo de parse_date, memoizado: a mesma data se repete em várias linhas
+    
+    Campos ausentes no texto vêm de `today`, que também faz parte da chave do cache.
+    """
     try:
-        text = str(text).strip()
+        # Caminho rápido para os formatos numéricos do portal
+        parsed = _fast_parse_date(text, fuzzy, today.year)
+        if parsed:
+            return parsed
         
-        # Tenta parsear com dateutil (aceita vários formatos)
-        dt = date_parser.parse(text, fuzzy=fuzzy, dayfirst=True)
+        # Fallback com dateutil (aceita vários formatos), importado só quando necessário
+        from dateutil import parser as date_parser
+        default = datetime(today.year, today.month, today.day)
+        dt = date_parser.parse(text, fuzzy=fuzzy, dayfirst=True, default=default)
         return dt.strftime('%Y-%m-%d')
         
     except (ValueError, AttributeError) as e:
@@ -96,22 +195,14 @@ def filter_rows_by_date(
     if not rows:
         return []
     
-    filtered = []
-    
-    for row in rows:
-        date_str = row.get('date')
-        if not date_str:
-            continue
-        
-        # Verifica se está no intervalo
-        if start_date and date_str < start_date:
-            continue
-        if end_date and date_str > end_date:
-            continue
-        
-        filtered.append(row)
+    # Limites sentinela reduzem o teste de intervalo a uma comparação encadeada
+    low = start_date or ''
+    high = end_date or '\uffff'
     
-    return filtered
+    return [
+        row for row in rows
+        if (date_str := row.get('date')) and low <= date_str <= high
+    ]
 
 
 def calculate_total(rows: List[Dict[str, Any]]) -> float:
@@ -124,14 +215,80 @@ def calculate_total(rows: List[Dict[str, Any]]) -> float:
     Returns:
         Soma total
     """
+    total = sum(
+        (kg for row in rows if isinstance(kg := row.get('kg'), (int, float))),
+        0.0
+    )
+    
+    return round(total, 2)
+
+
+def filter_and_sum(
+    rows: List[Dict[str, Any]],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Filtra linhas por intervalo de datas e soma o kg numa única passada
+    
+    Equivale a filter_rows_by_date seguido de calculate_total, sem percorrer
+    a lista duas vezes.
+    
+    Args:
+        rows: Lista de dicionários com chaves 'date' e 'kg'
+        start_date: Data inicial (formato ISO)
+        end_date: Data final (formato ISO)
+    
+    Returns:
+        Tupla (linhas filtradas, soma total)
+    """
+    low = start_date or ''
+    high = end_date or '\uffff'
+    
+    filtered = []
     total = 0.0
     
     for row in rows:
+        date_str = row.get('date')
+        if not date_str or not low <= date_str <= high:
+            continue
+        
+        filtered.append(row)
         kg = row.get('kg')
-        if kg is not None and isinstance(kg, (int, float)):
+        if isinstance(kg, (int, float)):
             total += kg
     
-    return round(total, 2)
+    return filtered, round(total, 2)
+
+
+def filter_and_sum_columns(
+    dates: List[str],
+    kgs: List[float],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Tuple[List[int], float]:
+    """
+    Versão colunar de filter_and_sum, sobre listas paralelas de datas e kg
+    
+    Trabalha direto nas colunas extraídas da tabela, de modo que só as linhas
+    dentro do intervalo precisam virar dicionários.
+    
+    Args:
+        dates: Datas já parseadas (formato ISO)
+        kgs: Valores de kg já parseados, na mesma ordem de `dates`
+        start_date: Data inicial (formato ISO)
+        end_date: Data final (formato ISO)
+    
+    Returns:
+        Tupla (índices das linhas no intervalo, soma total)
+    """
+    low = start_date or ''
+    high = end_date or '\uffff'
+    
+    keep = [i for i, date_str in enumerate(dates) if low <= date_str <= high]
+    total = sum((kgs[i] for i in keep), 0.0)
+    
+    return keep, round(total, 2)
 
 
 def normalize_unit_id(unit_id: str) -> str:
@@ -148,10 +305,22 @@ def normalize_unit_id(unit_id: str) -> str:
         return ""
     
     # Remove espaços e caracteres especiais, mantém apenas alfanuméricos e hífen
-    normalized = re.sub(r'[^\w\-]', '', str(unit_id).strip())
+    normalized = str(unit_id).translate(_UNIT_ID_KEEP_TABLE)
     return normalized.lower()
 
 
+def _normalize_date_arg(value: str) -> Optional[str]:
+    """Normaliza uma data de entrada, validando strings ISO sem passar por parse_date"""
+    if _ISO_DATE_RE.fullmatch(value):
+        try:
+            datetime.fromisoformat(value)
+            return value
+        except ValueError:
+            return None
+    
+    return parse_date(value, fuzzy=False)
+
+
 def validate_date_range(start_date: Optional[str], end_date: Optional[str]) -> tuple[Optional[str], Optional[str]]:
     """
     Valida e normaliza intervalo de datas
@@ -164,10 +333,10 @@ def validate_date_range(start_date: Optional[str], end_date: Optional[str]) -> t
         Tupla (start_date, end_date) normalizada
     """
     if start_date:
-        start_date = parse_date(start_date, fuzzy=False)
+        start_date = _normalize_date_arg(start_date)
     
     if end_date:
-        end_date = parse_date(end_date, fuzzy=False)
+        end_date = _normalize_date_arg(end_date)
     
     # Se apenas uma data foi fornecida, usar a mesma para início e fim
     if start_date and not end_date:
@@ -2,13 +2,207 @@
 Módulo de scraping usando Playwright
 """
 import asyncio
-import json
+import re
+import orjson
+from datetime import date
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-from playwright.async_api import async_playwright, Browser, Page, TimeoutError as PlaywrightTimeout
+from typing import Optional, List, Dict, Any, Tuple
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route, TimeoutError as PlaywrightTimeout
 from .config import settings
 from .logger import logger
-from .parser import parse_kg, parse_date, filter_rows_by_date, calculate_total
+from .parser import parse_kg, parse_date, filter_and_sum_columns
+
+
+# Seletores de login, tela e tabela (as versões *_SELECTOR já vêm unidas por vírgula,
+# para que todas as alternativas sejam testadas numa única consulta)
+_LOGIN_USER_SELECTORS = (
+    'input[name="username"]', 'input[name="user"]', 'input[id="username"]',
+    'input[type="text"]', 'input[placeholder*="usuário"]', 'input[placeholder*="user"]'
+)
+_LOGIN_PASS_SELECTORS = (
+    'input[name="password"]', 'input[id="password"]',
+    'input[type="password"]', 'input[placeholder*="senha"]'
+)
+_SUBMIT_SELECTORS = (
+    'button[type="submit"]', 'input[type="submit"]',
+    'button:has-text("Entrar")', 'button:has-text("Login")',
+    'button:has-text("Acessar")'
+)
+_LOGIN_INDICATORS = (
+    'input[type="password"]',
+    'text=usuário',
+    'text=senha',
+    'text=login',
+    'text=entrar'
+)
+_MONTHYEAR_SELECTORS = (
+    'select[name*="mes"]', 'select[name*="month"]',
+    'select[id*="mes"]', 'select[id*="month"]',
+    'select[name*="periodo"]', 'select[name*="data"]'
+)
+
+# Probe de login: devolve o primeiro seletor de cada lista com elemento visível.
+# Seletores inválidos em querySelector (ex.: :has-text) são simplesmente ignorados.
+_LOGIN_PROBE_JS = """([userSelectors, passSelectors, submitSelectors]) => {
+    const pick = selectors => selectors.find(selector => {
+        try {
+            const el = document.querySelector(selector);
+            return el !== null && (el.checkVisibility ? el.checkVisibility() : el.offsetParent !== null);
+        } catch (e) {
+            return false;
+        }
+    }) || null;
+    const user = pick(userSelectors);
+    const pass = pick(passSelectors);
+    return user && pass ? {user, pass, submit: pick(submitSelectors)} : null;
+}"""
+_LOGIN_PROBE_ARG = [list(_LOGIN_USER_SELECTORS), list(_LOGIN_PASS_SELECTORS), list(_SUBMIT_SELECTORS)]
+
+_SUBMIT_SELECTOR = ', '.join(_SUBMIT_SELECTORS)
+_MONTHYEAR_SELECTOR = ', '.join(_MONTHYEAR_SELECTORS)
+
+# Primeiro <select> de mês/ano, na ordem da lista de seletores, que tem uma opção
+# com algum dos valores candidatos: devolve [seletor, índice, valor] ou null
+_MONTHYEAR_PICK_JS = """([selectors, values]) => {
+    for (const selector of selectors) {
+        const selects = document.querySelectorAll(selector);
+        for (let index = 0; index < selects.length; index++) {
+            const available = new Set(Array.from(selects[index].options || [], option => option.value));
+            const value = values.find(candidate => available.has(candidate));
+            if (value !== undefined) return [selector, index, value];
+        }
+    }
+    return null;
+}"""
+
+# Linhas da tabela lidas por extract_table_columns
+_TABLE_ROW_SELECTOR = 'table tbody tr, table tr'
+
+# Texto da primeira linha da tabela, antes e depois de trocar o mês/ano
+_FIRST_ROW_TEXT_JS = "() => (document.querySelector('table tbody tr') || {}).innerText || ''"
+_FIRST_ROW_CHANGED_JS = """(prev) => {
+    const row = document.querySelector('table tbody tr');
+    return row !== null && row.innerText !== prev;
+}"""
+
+# Seletores de célula que podem ser resolvidos por índice em row.cells
+_NTH_CELL_RE = re.compile(r'td:nth-child\((\d+)\)')
+
+# Marcadores de página pronta: formulário de login ou tabela de dados
+_PAGE_READY_SELECTOR = 'input[type="password"], table'
+
+# Marcadores da página principal: formulário de login ou links de unidades
+_UNIT_LINK_SELECTOR = 'a[href*="unidade"], a[href*="unit"]'
+_PORTAL_READY_SELECTOR = f'input[type="password"], {_UNIT_LINK_SELECTOR}'
+
+
+# Recursos que não interferem na leitura da tabela e são abortados. O CSS fica:
+# sem ele, modais e textos de login escondidos por classe passam a contar como
+# visíveis para check_login_required e o login nunca vê o formulário sumir
+_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media'})
+
+
+async def _block_heavy_resources(route: Route):
+    """Handler de rota que aborta imagens, fontes e mídia"""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# Playwright e browser compartilhados por todos os scrapers do processo,
+# iniciados pelo primeiro start() e encerrados pelo último close()
+_PW_REF: Dict[str, Any] = {'pw': None, 'browser': None, 'n': 0, 'lock': asyncio.Lock()}
+
+
+async def _acquire_browser():
+    """
+    Obtém o Playwright e o browser compartilhados, iniciando-os na primeira referência
+    ou relançando-os se o browser em cache tiver se desconectado
+    
+    Returns:
+        Tupla (playwright, browser)
+    """
+    async with _PW_REF['lock']:
+        stale = _PW_REF['browser']
+        if stale is not None and not stale.is_connected():
+            # Browser caiu (crash/OOM): descarta o driver antigo e relança para os próximos
+            logger.warning("Browser compartilhado desconectado, relançando")
+            await _stop_quietly(_PW_REF['pw'])
+            _PW_REF['pw'] = _PW_REF['browser'] = None
+        
+        if _PW_REF['browser'] is None:
+            logger.info("Iniciando Playwright...")
+            playwright = await async_playwright().start()
+            
+            # Configurações do browser
+            browser_args = [
+                '--no-sandbox',
+                '--disable-setuid-sandbox',
+                '--disable-dev-shm-usage',
+                '--disable-blink-features=AutomationControlled',
+                '--blink-settings=imagesEnabled=false'
+            ]
+            
+            try:
+                browser = await playwright.chromium.launch(
+                    headless=True,
+                    args=browser_args
+                )
+            except Exception:
+                await playwright.stop()
+                raise
+            
+            _PW_REF['pw'], _PW_REF['browser'] = playwright, browser
+            logger.info("Browser iniciado com sucesso")
+        else:
+            logger.debug("Reutilizando browser compartilhado")
+        
+        _PW_REF['n'] += 1
+        return _PW_REF['pw'], _PW_REF['browser']
+
+
+async def _release_browser():
+    """Libera uma referência ao browser compartilhado, fechando-o na última"""
+    async with _PW_REF['lock']:
+        _PW_REF['n'] -= 1
+        if _PW_REF['n'] > 0:
+            return
+        
+        browser, playwright = _PW_REF['browser'], _PW_REF['pw']
+        _PW_REF['pw'] = _PW_REF['browser'] = None
+        if browser is None:
+            # Já descartado após uma desconexão
+            return
+        try:
+            await browser.close()
+            logger.info("Browser fechado")
+        finally:
+            await playwright.stop()
+
+
+async def _stop_quietly(playwright) -> None:
+    """Encerra um driver do Playwright ignorando erros (browser já desconectado)"""
+    try:
+        await playwright.stop()
+    except Exception as e:
+        logger.debug(f"Erro ao encerrar Playwright antigo: {e}")
+
+
+def _cell_index(selector: str) -> Optional[int]:
+    """Converte 'td:nth-child(N)' no índice N-1 de row.cells, ou None para outros seletores"""
+    match = _NTH_CELL_RE.fullmatch(selector.strip())
+    return int(match.group(1)) - 1 if match and int(match.group(1)) > 0 else None
+
+
+def _rows_from_columns(columns: Dict[str, List[Any]], indices) -> List[Dict[str, Any]]:
+    """Monta os dicionários de linha (date, kg, raw_date, raw_kg) só para os índices pedidos"""
+    dates, kgs = columns['dates'], columns['kgs']
+    raw_dates, raw_kgs = columns['raw_dates'], columns['raw_kgs']
+    return [
+        {'date': dates[i], 'kg': kgs[i], 'raw_date': raw_dates[i], 'raw_kg': raw_kgs[i]}
+        for i in indices
+    ]
 
 
 class LavanderiaPortalScraper:
@@ -18,6 +212,12 @@ class LavanderiaPortalScraper:
         self.storage_state_path = storage_state_path or (settings.storage_dir / "storage_state.json")
         self.browser: Optional[Browser] = None
         self.playwright = None
+        # storage_state lido uma vez em start() e atualizado após login
+        self._storage_state: Optional[Dict[str, Any]] = None
+        # Contexto único compartilhado pelas unidades; o login nele é serializado
+        self.context: Optional[BrowserContext] = None
+        self._login_lock = asyncio.Lock()
+        self._login_generation = 0
         
     async def __aenter__(self):
         """Context manager entry"""
@@ -29,42 +229,41 @@ class LavanderiaPortalScraper:
         await self.close()
     
     async def start(self):
-        """Inicia o browser"""
-        logger.info("Iniciando Playwright...")
-        self.playwright = await async_playwright().start()
-        
-        # Configurações do browser
-        browser_args = [
-            '--no-sandbox',
-            '--disable-setuid-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-blink-features=AutomationControlled'
-        ]
-        
-        # Tenta carregar storage_state se existir
-        storage_state = None
+        """Inicia o browser e o contexto compartilhado entre as unidades"""
+        # Tenta carregar storage_state se existir (reutilizado por todas as unidades)
         if self.storage_state_path.exists():
             try:
-                with open(self.storage_state_path, 'r') as f:
-                    storage_state = json.load(f)
+                self._storage_state = orjson.loads(self.storage_state_path.read_bytes())
                 logger.info(f"Storage state carregado de {self.storage_state_path}")
             except Exception as e:
                 logger.warning(f"Erro ao carregar storage_state: {e}")
         
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=browser_args
-        )
+        self.playwright, self.browser = await _acquire_browser()
         
-        logger.info("Browser iniciado com sucesso")
+        try:
+            # Cria contexto com ou sem storage_state; cada unidade abre só uma página nele
+            self.context = await self.browser.new_context(
+                storage_state=self._storage_state,
+                viewport={'width': 1920, 'height': 1080},
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            )
+            await self.context.route('**/*', _block_heavy_resources)
+        except Exception:
+            await self.close()
+            raise
     
     async def close(self):
-        """Fecha o browser"""
-        if self.browser:
-            await self.browser.close()
-            logger.info("Browser fechado")
-        if self.playwright:
-            await self.playwright.stop()
+        """Fecha o contexto e libera a referência ao browser compartilhado"""
+        try:
+            if self.context:
+                context, self.context = self.context, None
+                await context.close()
+        finally:
+            # Libera a referência mesmo se o contexto falhar ao fechar (ex.: browser caído)
+            if self.browser:
+                self.browser = None
+                self.playwright = None
+                await _release_browser()
     
     async def login(self, page: Page, username: str, password: str) -> bool:
         """
@@ -81,75 +280,40 @@ class LavanderiaPortalScraper:
         try:
             logger.info("Detectando tela de login...")
             
-            # Detecta campos de login comuns
-            login_selectors = [
-                'input[name="username"]', 'input[name="user"]', 'input[id="username"]',
-                'input[type="text"]', 'input[placeholder*="usuário"]', 'input[placeholder*="user"]'
-            ]
-            
-            password_selectors = [
-                'input[name="password"]', 'input[id="password"]', 
-                'input[type="password"]', 'input[placeholder*="senha"]'
-            ]
-            
-            # Tenta encontrar campo de usuário
-            username_field = None
-            for selector in login_selectors:
-                try:
-                    username_field = await page.wait_for_selector(selector, timeout=2000)
-                    if username_field:
-                        break
-                except:
-                    continue
-            
-            if not username_field:
-                logger.warning("Campo de usuário não encontrado")
-                return False
-            
-            # Tenta encontrar campo de senha
-            password_field = None
-            for selector in password_selectors:
-                try:
-                    password_field = await page.wait_for_selector(selector, timeout=2000)
-                    if password_field:
-                        break
-                except:
-                    continue
-            
-            if not password_field:
-                logger.warning("Campo de senha não encontrado")
+            # Um único probe no navegador procura usuário, senha e botão de uma vez,
+            # repetindo até os dois campos aparecerem
+            try:
+                probe = await page.wait_for_function(_LOGIN_PROBE_JS, arg=_LOGIN_PROBE_ARG, timeout=2000)
+                found = await probe.json_value()
+            except PlaywrightTimeout:
+                logger.warning("Campos de usuário/senha não encontrados")
                 return False
             
             logger.info("Campos de login detectados, preenchendo...")
             
             # Preenche credenciais
-            await username_field.fill(username)
-            await password_field.fill(password)
-            
-            # Procura botão de submit
-            submit_selectors = [
-                'button[type="submit"]', 'input[type="submit"]',
-                'button:has-text("Entrar")', 'button:has-text("Login")',
-                'button:has-text("Acessar")'
-            ]
+            await page.fill(found['user'], username, timeout=settings.selector_timeout_ms)
+            await page.fill(found['pass'], password, timeout=settings.selector_timeout_ms)
             
-            for selector in submit_selectors:
-                try:
-                    submit_btn = await page.wait_for_selector(selector, timeout=2000)
-                    if submit_btn:
-                        await submit_btn.click()
-                        logger.info("Login submetido")
-                        break
-                except:
-                    continue
-            
-            # Aguarda navegação após login
-            await page.wait_for_load_state('networkidle', timeout=settings.nav_timeout * 1000)
+            # Seletores :has-text só existem no Playwright; sem match em CSS puro,
+            # o botão é procurado pelo seletor completo
+            submit_selector = found['submit'] or _SUBMIT_SELECTOR
+            try:
+                await page.click(submit_selector, timeout=2000)
+                logger.info("Login submetido")
+            except PlaywrightTimeout:
+                logger.warning("Botão de login não encontrado")
+            
+            # Aguarda o formulário de login sumir em vez de esperar a rede ociosa
+            await page.wait_for_selector(
+                'input[type="password"]', state='hidden', timeout=settings.goto_timeout_ms
+            )
             
             # Salva storage_state após login bem-sucedido
             storage_state = await page.context.storage_state()
-            with open(self.storage_state_path, 'w') as f:
-                json.dump(storage_state, f)
+            self._storage_state = storage_state
+            with open(self.storage_state_path, 'wb') as f:
+                f.write(orjson.dumps(storage_state))
             logger.info(f"Storage state salvo em {self.storage_state_path}")
             
             return True
@@ -158,6 +322,57 @@ class LavanderiaPortalScraper:
             logger.error(f"Erro durante login: {e}")
             return False
     
+    async def login_once(self, page: Page, username: str, password: str, generation: int) -> bool:
+        """
+        Realiza login no contexto compartilhado, um worker por vez
+        
+        Args:
+            page: Página do Playwright
+            username: Nome de usuário
+            password: Senha
+            generation: Valor de _login_generation lido antes de navegar
+        
+        Returns:
+            True se o contexto está autenticado
+        """
+        async with self._login_lock:
+            if self._login_generation != generation:
+                # Outro worker já autenticou o contexto enquanto esta página carregava
+                return True
+            
+            login_success = await self.login(page, username, password)
+            if login_success:
+                self._login_generation += 1
+            return login_success
+    
+    async def wait_for_page_ready(self, page: Page):
+        """
+        Aguarda o formulário de login ou a tabela de dados aparecer no DOM
+        
+        Args:
+            page: Página do Playwright
+        """
+        try:
+            await page.wait_for_selector(
+                _PAGE_READY_SELECTOR, state='attached', timeout=settings.selector_timeout_ms
+            )
+        except PlaywrightTimeout:
+            logger.warning("Nem tela de login nem tabela detectadas após carregar a página")
+    
+    async def wait_for_portal_ready(self, page: Page):
+        """
+        Aguarda o formulário de login ou os links de unidades aparecerem no DOM
+        
+        Args:
+            page: Página do Playwright
+        """
+        try:
+            await page.wait_for_selector(
+                _PORTAL_READY_SELECTOR, state='attached', timeout=settings.selector_timeout_ms
+            )
+        except PlaywrightTimeout:
+            logger.warning("Nem tela de login nem links de unidades detectados após carregar a página")
+    
     async def check_login_required(self, page: Page) -> bool:
         """
         Verifica se a página atual requer login
@@ -169,82 +384,73 @@ class LavanderiaPortalScraper:
             True se login é necessário
         """
         try:
-            # Procura por indicadores de tela de login
-            login_indicators = [
-                'input[type="password"]',
-                'text=usuário',
-                'text=senha',
-                'text=login',
-                'text=entrar'
-            ]
+            # Seletores text= não combinam com CSS via vírgula; or_ testa todos de uma vez
+            indicator = page.locator(_LOGIN_INDICATORS[0])
+            for selector in _LOGIN_INDICATORS[1:]:
+                indicator = indicator.or_(page.locator(selector))
             
-            for indicator in login_indicators:
-                try:
-                    element = await page.wait_for_selector(indicator, timeout=2000)
-                    if element:
-                        logger.info("Tela de login detectada")
-                        return True
-                except:
-                    continue
+            try:
+                await indicator.first.wait_for(timeout=2000)
+            except PlaywrightTimeout:
+                return False
             
-            return False
+            logger.info("Tela de login detectada")
+            return True
             
         except Exception as e:
             logger.debug(f"Erro ao verificar login: {e}")
             return False
     
-    async def select_month_year(self, page: Page, target_date: str) -> bool:
+    async def select_month_year(self, page: Page, target_month: int, target_year: int) -> bool:
         """
         Seleciona mês/ano no dropdown do portal
         
         Args:
             page: Página do Playwright
-            target_date: Data alvo no formato YYYY-MM-DD
+            target_month: Mês alvo (1-12)
+            target_year: Ano alvo
         
         Returns:
             True se seleção bem-sucedida
         """
         try:
-            from datetime import datetime
-            dt = datetime.strptime(target_date, '%Y-%m-%d')
-            target_month = dt.month
-            target_year = dt.year
-            
             logger.info(f"Selecionando mês/ano: {target_month}/{target_year}")
             
-            # Procura por select de mês/ano
-            select_selectors = [
-                'select[name*="mes"]', 'select[name*="month"]',
-                'select[id*="mes"]', 'select[id*="month"]',
-                'select[name*="periodo"]', 'select[name*="data"]'
+            try:
+                await page.wait_for_selector(_MONTHYEAR_SELECTOR, timeout=2000)
+            except PlaywrightTimeout:
+                logger.warning("Dropdown de mês/ano não encontrado")
+                return False
+            
+            # Tenta várias combinações de valor
+            month_str = f"{target_month:02d}"
+            year_str = str(target_year)
+            options = [
+                f"{year_str}-{month_str}",
+                f"{month_str}/{year_str}",
+                f"{month_str}-{year_str}",
+                month_str
             ]
             
-            for selector in select_selectors:
+            # Escolhe, na ordem da lista de seletores, o primeiro select que aceita
+            # algum dos valores (um select genérico não barra os demais)
+            choice = await page.evaluate(_MONTHYEAR_PICK_JS, [list(_MONTHYEAR_SELECTORS), options])
+            if choice:
+                selector, index, option = choice
+                
+                # Primeira linha atual da tabela: a troca de mês é detectada quando ela muda
+                prev_row = await page.evaluate(_FIRST_ROW_TEXT_JS)
+                
+                await page.locator(selector).nth(index).select_option(
+                    value=option, timeout=settings.selector_timeout_ms
+                )
+                logger.info(f"Mês/ano selecionado: {option}")
                 try:
-                    select = await page.wait_for_selector(selector, timeout=2000)
-                    if select:
-                        # Tenta selecionar por valor
-                        month_str = f"{target_month:02d}"
-                        year_str = str(target_year)
-                        
-                        # Tenta várias combinações
-                        options = [
-                            f"{year_str}-{month_str}",
-                            f"{month_str}/{year_str}",
-                            f"{month_str}-{year_str}",
-                            month_str
-                        ]
-                        
-                        for option in options:
-                            try:
-                                await select.select_option(value=option)
-                                logger.info(f"Mês/ano selecionado: {option}")
-                                await page.wait_for_load_state('networkidle', timeout=5000)
-                                return True
-                            except:
-                                continue
-                except:
-                    continue
+                    await page.wait_for_function(_FIRST_ROW_CHANGED_JS, arg=prev_row, timeout=5000)
+                except PlaywrightTimeout:
+                    # O período já podia estar selecionado; a tabela atual segue válida
+                    logger.debug("Tabela não mudou após selecionar mês/ano")
+                return True
             
             logger.warning("Não foi possível selecionar mês/ano automaticamente")
             return False
@@ -270,84 +476,117 @@ class LavanderiaPortalScraper:
         Returns:
             Lista de dicionários com date, kg, raw_date, raw_kg
         """
+        columns = await self.extract_table_columns(page, date_selector, kg_selector)
+        return _rows_from_columns(columns, range(len(columns['dates'])))
+    
+    async def extract_table_columns(
+        self,
+        page: Page,
+        date_selector: str = "td:nth-child(1)",
+        kg_selector: str = "td:nth-child(2)"
+    ) -> Dict[str, List[Any]]:
+        """
+        Extrai a tabela de uma unidade como colunas paralelas já parseadas
+        
+        Args:
+            page: Página do Playwright
+            date_selector: Seletor CSS para célula de data
+            kg_selector: Seletor CSS para célula de kg
+        
+        Returns:
+            Dicionário com listas 'dates', 'kgs', 'raw_dates' e 'raw_kgs',
+            contendo só as linhas em que data e kg foram parseados
+        
+        Raises:
+            PlaywrightTimeout se nenhuma tabela aparecer dentro de selector_timeout_ms
+        """
+        parsed = {'dates': [], 'kgs': [], 'raw_dates': [], 'raw_kgs': []}
+        
+        logger.info("Extraindo dados da tabela...")
+        
+        # Uma única espera pelas linhas que o evaluate abaixo vai ler; se elas
+        # existem, a tabela já está no DOM e não há o que sondar de novo
         try:
-            logger.info("Extraindo dados da tabela...")
-            
-            # Aguarda tabela carregar
-            await page.wait_for_load_state('networkidle', timeout=settings.nav_timeout * 1000)
-            
-            # Tenta encontrar tabela
-            table_selectors = [
-                'table', 'table#report', 'table.data-table',
-                'div[role="table"]', '.table', '#data-table'
-            ]
-            
-            table = None
-            for selector in table_selectors:
-                try:
-                    table = await page.wait_for_selector(selector, timeout=5000)
-                    if table:
-                        logger.info(f"Tabela encontrada com seletor: {selector}")
-                        break
-                except:
-                    continue
-            
-            if not table:
-                logger.warning("Nenhuma tabela encontrada na página")
-                return []
-            
-            # Extrai linhas
-            rows_data = []
-            
-            # Tenta extrair via JavaScript
-            rows = await page.evaluate("""
-                (dateSelector, kgSelector) => {
-                    const rows = [];
-                    const tableRows = document.querySelectorAll('table tbody tr, table tr');
+            await page.wait_for_selector(
+                _TABLE_ROW_SELECTOR, state='attached', timeout=settings.selector_timeout_ms
+            )
+            logger.info("Tabela encontrada")
+        except PlaywrightTimeout:
+            if await page.locator('table').count():
+                # A tabela existe, só não tem linhas: período vazio, não uma falha
+                logger.warning("Tabela sem linhas na página")
+                return parsed
+            # Nenhuma tabela ainda: propaga o timeout para scrape_unit marcar erro
+            # e o retry tentar de novo, em vez de reportar 0 kg como sucesso
+            logger.warning("Nenhuma tabela encontrada na página")
+            raise
+        
+        try:
+            # Extrai as células como duas listas paralelas de strings: um único
+            # payload compacto em vez de um objeto por linha
+            columns = await page.evaluate("""
+                ([rowSelector, dateSelector, kgSelector, dateIndex, kgIndex]) => {
+                    const dates = [];
+                    const kgs = [];
+                    const tableRows = document.querySelectorAll(rowSelector);
+                    const byIndex = dateIndex !== null && kgIndex !== null;
+                    
+                    // Em <table> nativa, td:nth-child(N) é só row.cells[N-1]
+                    const cellAt = (row, index) => {
+                        const cell = row.cells[index];
+                        return cell && cell.tagName === 'TD' ? cell : null;
+                    };
                     
                     tableRows.forEach(row => {
                         try {
-                            const dateCells = row.querySelectorAll(dateSelector);
-                            const kgCells = row.querySelectorAll(kgSelector);
-                            
-                            if (dateCells.length > 0 && kgCells.length > 0) {
-                                rows.push({
-                                    raw_date: dateCells[0].textContent.trim(),
-                                    raw_kg: kgCells[0].textContent.trim()
-                                });
+                            let dateCell, kgCell;
+                            if (byIndex && row.cells) {
+                                dateCell = cellAt(row, dateIndex);
+                                kgCell = cellAt(row, kgIndex);
+                            } else {
+                                dateCell = row.querySelector(dateSelector);
+                                kgCell = row.querySelector(kgSelector);
                             }
+                            if (!dateCell || !kgCell) return;
+                            
+                            const rawDate = dateCell.textContent.trim();
+                            if (!rawDate) return;
+                            
+                            dates.push(rawDate);
+                            kgs.push(kgCell.textContent.trim());
                         } catch (e) {
                             console.error('Erro ao extrair linha:', e);
                         }
                     });
                     
-                    return rows;
+                    return {dates, kgs};
                 }
-            """, date_selector, kg_selector)
-            
-            # Processa cada linha
-            for row in rows:
-                raw_date = row.get('raw_date', '')
-                raw_kg = row.get('raw_kg', '')
-                
+            """, [
+                _TABLE_ROW_SELECTOR, date_selector, kg_selector,
+                _cell_index(date_selector), _cell_index(kg_selector)
+            ])
+            
+            # Processa cada linha, acumulando em colunas em vez de um dicionário por linha
+            dates, kgs = parsed['dates'], parsed['kgs']
+            raw_dates, raw_kgs = parsed['raw_dates'], parsed['raw_kgs']
+            for raw_date, raw_kg in zip(columns['dates'], columns['kgs']):
                 parsed_date = parse_date(raw_date)
                 parsed_kg = parse_kg(raw_kg)
                 
                 # Só adiciona se conseguiu parsear ambos
                 if parsed_date and parsed_kg is not None:
-                    rows_data.append({
-                        'date': parsed_date,
-                        'kg': parsed_kg,
-                        'raw_date': raw_date,
-                        'raw_kg': raw_kg
-                    })
+                    dates.append(parsed_date)
+                    kgs.append(parsed_kg)
+                    raw_dates.append(raw_date)
+                    raw_kgs.append(raw_kg)
             
-            logger.info(f"Extraídas {len(rows_data)} linhas válidas")
-            return rows_data
+            logger.info(f"Extraídas {len(dates)} linhas válidas")
             
         except Exception as e:
             logger.error(f"Erro ao extrair dados da tabela: {e}")
-            return []
+            parsed = {'dates': [], 'kgs': [], 'raw_dates': [], 'raw_kgs': []}
+        
+        return parsed
     
     async def scrape_unit(
         self,
@@ -355,7 +594,8 @@ class LavanderiaPortalScraper:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         username: Optional[str] = None,
-        password: Optional[str] = None
+        password: Optional[str] = None,
+        page: Optional[Page] = None
     ) -> Dict[str, Any]:
         """
         Faz scraping de uma unidade específica
@@ -366,6 +606,7 @@ class LavanderiaPortalScraper:
             end_date: Data final (YYYY-MM-DD)
             username: Nome de usuário para login
             password: Senha para login
+            page: Página já aberta a reutilizar (não é fechada ao final)
         
         Returns:
             Dicionário com unit_id, rows, total, error
@@ -377,61 +618,20 @@ class LavanderiaPortalScraper:
             'error': None
         }
         
-        context = None
-        page = None
+        owns_page = page is None
         
         try:
             logger.info(f"Iniciando scraping da unidade: {unit_id}")
             
-            # Cria contexto com ou sem storage_state
-            storage_state = None
-            if self.storage_state_path.exists():
-                with open(self.storage_state_path, 'r') as f:
-                    storage_state = json.load(f)
+            if owns_page:
+                page = await self.context.new_page()
             
-            context = await self.browser.new_context(
-                storage_state=storage_state,
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            # Limite total por unidade: uma unidade travada não segura o lote inteiro
+            rows, total = await asyncio.wait_for(
+                self._load_unit_rows(page, unit_id, start_date, end_date, username, password),
+                timeout=settings.unit_total_timeout
             )
             
-            page = await context.new_page()
-            
-            # Monta URL da unidade
-            if settings.unit_url_template and '{unit_id}' in settings.unit_url_template:
-                unit_url = settings.unit_url_template.replace('{unit_id}', str(unit_id))
-            else:
-                unit_url = f"{settings.portal_url}?unit={unit_id}"
-            
-            logger.info(f"Navegando para: {unit_url}")
-            await page.goto(unit_url, wait_until='networkidle', timeout=settings.nav_timeout * 1000)
-            
-            # Verifica se precisa fazer login
-            if await self.check_login_required(page):
-                if not username or not password:
-                    raise Exception("Login necessário mas credenciais não fornecidas")
-                
-                login_success = await self.login(page, username, password)
-                if not login_success:
-                    raise Exception("Falha no login")
-                
-                # Navega novamente após login
-                await page.goto(unit_url, wait_until='networkidle', timeout=settings.nav_timeout * 1000)
-            
-            # Seleciona mês/ano se data fornecida
-            if start_date:
-                await self.select_month_year(page, start_date)
-            
-            # Extrai dados da tabela
-            rows = await self.extract_table_data(page)
-            
-            # Filtra por data se necessário
-            if start_date or end_date:
-                rows = filter_rows_by_date(rows, start_date, end_date)
-            
-            # Calcula total
-            total = calculate_total(rows)
-            
             result['rows'] = rows
             result['total'] = total
             
@@ -442,19 +642,117 @@ class LavanderiaPortalScraper:
             logger.error(error_msg)
             result['error'] = error_msg
             
+        except asyncio.TimeoutError:
+            error_msg = f"Tempo limite de {settings.unit_total_timeout}s excedido na unidade {unit_id}"
+            logger.error(error_msg)
+            result['error'] = error_msg
+            
         except Exception as e:
             error_msg = f"Erro ao processar unidade {unit_id}: {str(e)}"
             logger.error(error_msg)
             result['error'] = error_msg
         
         finally:
-            if page:
+            if owns_page and page:
                 await page.close()
-            if context:
-                await context.close()
         
         return result
     
+    async def _load_unit_rows(
+        self,
+        page: Page,
+        unit_id: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        username: Optional[str],
+        password: Optional[str]
+    ) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Navega até a unidade, faz login se preciso e extrai as linhas do período
+        
+        Returns:
+            Tupla (linhas filtradas, soma total)
+        """
+        generation = self._login_generation
+        
+        # Monta URL da unidade
+        if settings.unit_url_template and '{unit_id}' in settings.unit_url_template:
+            unit_url = settings.unit_url_template.replace('{unit_id}', str(unit_id))
+        else:
+            unit_url = f"{settings.portal_url}?unit={unit_id}"
+        
+        logger.info(f"Navegando para: {unit_url}")
+        await page.goto(unit_url, wait_until='domcontentloaded', timeout=settings.goto_timeout_ms)
+        await self.wait_for_page_ready(page)
+        
+        # Verifica se precisa fazer login
+        if await self.check_login_required(page):
+            if not username or not password:
+                raise Exception("Login necessário mas credenciais não fornecidas")
+            
+            login_success = await self.login_once(page, username, password, generation)
+            if not login_success:
+                raise Exception("Falha no login")
+            
+            # Navega novamente após login
+            await page.goto(unit_url, wait_until='domcontentloaded', timeout=settings.goto_timeout_ms)
+            await self.wait_for_page_ready(page)
+        
+        # Seleciona mês/ano se data fornecida
+        if start_date:
+            target = date.fromisoformat(start_date)
+            await self.select_month_year(page, target.month, target.year)
+        
+        # Extrai a tabela em colunas, filtra e soma antes de montar as linhas
+        columns = await self.extract_table_columns(page)
+        keep, total = filter_and_sum_columns(columns['dates'], columns['kgs'], start_date, end_date)
+        return _rows_from_columns(columns, keep), total
+    
+    async def scrape_units_sequential(
+        self,
+        units: List[str],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Faz scraping de várias unidades, uma após a outra, numa única página
+        
+        Evita abrir e fechar uma página por unidade quando não há concorrência;
+        todas as unidades compartilham a mesma autenticação do contexto.
+        
+        Args:
+            units: IDs das unidades
+            start_date: Data inicial (YYYY-MM-DD)
+            end_date: Data final (YYYY-MM-DD)
+            username: Nome de usuário para login
+            password: Senha para login
+        
+        Returns:
+            Lista de resultados no formato de scrape_unit, na ordem de `units`
+        """
+        results = []
+        page = await self.context.new_page()
+        
+        try:
+            for unit_id in units:
+                results.append(await self.scrape_unit(
+                    unit_id=unit_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    username=username,
+                    password=password,
+                    page=page
+                ))
+                
+                # Delay entre unidades
+                await asyncio.sleep(settings.nav_delay / 1000)
+        finally:
+            await page.close()
+        
+        return results
+    
     async def discover_units(self, username: Optional[str] = None, password: Optional[str] = None) -> List[Dict[str, str]]:
         """
         Descobre automaticamente todas as unidades disponíveis
@@ -466,40 +764,31 @@ class LavanderiaPortalScraper:
         Returns:
             Lista de dicionários com unit_id e unit_name
         """
-        context = None
         page = None
         units = []
         
         try:
             logger.info("Descobrindo unidades disponíveis...")
             
-            # Cria contexto
-            storage_state = None
-            if self.storage_state_path.exists():
-                with open(self.storage_state_path, 'r') as f:
-                    storage_state = json.load(f)
-            
-            context = await self.browser.new_context(
-                storage_state=storage_state,
-                viewport={'width': 1920, 'height': 1080}
-            )
-            
-            page = await context.new_page()
+            page = await self.context.new_page()
+            generation = self._login_generation
             
             # Navega para página principal
             logger.info(f"Navegando para: {settings.portal_url}")
-            await page.goto(settings.portal_url, wait_until='networkidle', timeout=settings.nav_timeout * 1000)
+            await page.goto(settings.portal_url, wait_until='domcontentloaded', timeout=settings.goto_timeout_ms)
+            await self.wait_for_portal_ready(page)
             
             # Verifica login
             if await self.check_login_required(page):
                 if not username or not password:
                     raise Exception("Login necessário mas credenciais não fornecidas")
                 
-                login_success = await self.login(page, username, password)
+                login_success = await self.login_once(page, username, password, generation)
                 if not login_success:
                     raise Exception("Falha no login")
                 
-                await page.goto(settings.portal_url, wait_until='networkidle', timeout=settings.nav_timeout * 1000)
+                await page.goto(settings.portal_url, wait_until='domcontentloaded', timeout=settings.goto_timeout_ms)
+                await self.wait_for_portal_ready(page)
             
             # Extrai lista de unidades via JavaScript
             units = await page.evaluate("""
@@ -564,7 +853,5 @@ class LavanderiaPortalScraper:
         finally:
             if page:
                 await page.close()
-            if context:
-                await context.close()
         
         return units
@@ -8,6 +8,7 @@ Uso:
 import asyncio
 import argparse
 import csv
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
 from openpyxl import Workbook
@@ -15,7 +16,95 @@ from openpyxl import Workbook
 from app.scraper import LavanderiaPortalScraper
 from app.parser import validate_date_range
 from app.config import settings
-from app.logger import logger
+from app.logger import logger, forward_logs_from, log_to_queue
+
+
+async def scrape_concurrently(scraper: LavanderiaPortalScraper, units: list, start_date: str, end_date: str) -> list:
+    """Faz scraping das unidades em paralelo, limitado por max_concurrency"""
+    semaphore = asyncio.Semaphore(settings.max_concurrency)
+    
+    async def scrape_one(index: int, unit_id: str):
+        # Escalona o início de cada unidade em vez de esperar entre elas
+        await asyncio.sleep(index * settings.nav_delay / 1000)
+        
+        async with semaphore:
+            logger.info(f"Processando unidade {unit_id}...")
+            
+            return await scraper.scrape_unit(
+                unit_id=unit_id,
+                start_date=start_date,
+                end_date=end_date
+            )
+    
+    # Cada scrape_unit abre sua própria página no contexto compartilhado
+    return await asyncio.gather(*(
+        scrape_one(index, unit_id) for index, unit_id in enumerate(units)
+    ))
+
+
+async def _scrape_chunk(units: list, start_date: str, end_date: str) -> list:
+    """Faz scraping de um lote de unidades com um navegador próprio"""
+    async with LavanderiaPortalScraper() as scraper:
+        if settings.max_concurrency <= 1:
+            # Sem concorrência: uma única página navega por todas as unidades
+            return await scraper.scrape_units_sequential(units, start_date, end_date)
+        return await scrape_concurrently(scraper, units, start_date, end_date)
+
+
+def _scrape_chunk_worker(args: tuple) -> list:
+    """Ponto de entrada de cada processo do pool"""
+    return asyncio.run(_scrape_chunk(*args))
+
+
+def shard_units(units: list, workers: int) -> list:
+    """
+    Divide as unidades em até `workers` lotes contíguos, preservando a ordem
+    
+    Args:
+        units: Lista de IDs de unidades
+        workers: Número de lotes desejado
+        
+    Returns:
+        Lista de lotes não vazios
+    """
+    size = -(-len(units) // max(workers, 1))
+    return [units[i:i + size] for i in range(0, len(units), size)] if units else []
+
+
+def scrape_in_processes(units: list, start_date: str, end_date: str, workers: int) -> list:
+    """
+    Distribui as unidades entre processos, cada um com seu próprio driver do Playwright
+    
+    Args:
+        units: Lista de IDs de unidades
+        start_date: Data inicial
+        end_date: Data final
+        workers: Número de processos
+        
+    Returns:
+        Resultados na mesma ordem de `units`
+    """
+    chunks = shard_units(units, workers)
+    
+    # 'spawn' evita herdar o event loop e o estado do Playwright do processo pai
+    ctx = multiprocessing.get_context('spawn')
+    
+    # Os filhos mandam seus registros para cá: só este processo escreve o arquivo de log
+    log_queue = ctx.Queue()
+    log_listener = forward_logs_from(log_queue)
+    try:
+        with ctx.Pool(len(chunks), initializer=log_to_queue, initargs=(log_queue,)) as pool:
+            chunk_results = pool.map(
+                _scrape_chunk_worker,
+                [(chunk, start_date, end_date) for chunk in chunks]
+            )
+            # close/join em vez do terminate do with, para os filhos esvaziarem a fila de log
+            pool.close()
+            pool.join()
+    finally:
+        log_listener.stop()
+    
+    return [result for chunk in chunk_results for result in chunk]
 
 
 async def run_report(
@@ -23,7 +112,8 @@ async def run_report(
     start_date: str,
     end_date: str,
     output_format: str = 'csv',
-    output_path: str = None
+    output_path: str = None,
+    workers: int = 1
 ):
     """
     Executa relatório e salva em arquivo
@@ -34,6 +124,7 @@ async def run_report(
         end_date: Data final
         output_format: Formato de saída ('csv' ou 'excel')
         output_path: Caminho do arquivo de saída
+        workers: Número de processos de scraping (1 = processo atual)
     """
     logger.info(f"Iniciando relatório para {len(units)} unidades")
     logger.info(f"Período: {start_date} a {end_date}")
@@ -41,23 +132,14 @@ async def run_report(
     # Valida datas
     start_date, end_date = validate_date_range(start_date, end_date)
     
-    # Cria scraper
-    async with LavanderiaPortalScraper() as scraper:
-        results = []
-        
-        for unit_id in units:
-            logger.info(f"Processando unidade {unit_id}...")
-            
-            result = await scraper.scrape_unit(
-                unit_id=unit_id,
-                start_date=start_date,
-                end_date=end_date
-            )
-            
-            results.append(result)
-            
-            # Delay entre unidades
-            await asyncio.sleep(settings.nav_delay / 1000)
+    if workers > 1 and len(units) > 1:
+        # Cada processo tem seu próprio driver; o pool roda fora do event loop
+        logger.info(f"Distribuindo unidades entre {min(workers, len(units))} processos")
+        results = await asyncio.to_thread(
+            scrape_in_processes, units, start_date, end_date, workers
+        )
+    else:
+        results = await _scrape_chunk(units, start_date, end_date)
     
     # Gera arquivo de saída
     if not output_path:
@@ -94,76 +176,66 @@ async def run_report(
     print("="*60 + "\n")
 
 
+# Colunas do relatório (CSV e Excel)
+REPORT_HEADERS = ('Unidade', 'Data', 'Kg', 'Total Unidade', 'Erro')
+
+# Linha usada para unidades sem dados, que ainda aparecem no relatório
+_EMPTY_ROW = {'date': '', 'kg': ''}
+
+
+def flatten_results(results: list) -> list:
+    """Achata os resultados em tuplas (unidade, data, kg, total, erro), uma por linha"""
+    return [
+        (result['unit_id'], row['date'], row['kg'], result['total'], result.get('error'))
+        for result in results
+        for row in (result['rows'] or (_EMPTY_ROW,))
+    ]
+
+
 def save_csv(results: list, output_path: Path):
     """Salva resultados em CSV"""
-    with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+    # Buffer de 1 MiB: o relatório vai ao disco em poucos write() grandes
+    with open(output_path, 'w', newline='', encoding='utf-8-sig', buffering=1 << 20) as f:
         writer = csv.writer(f)
         
         # Cabeçalho
-        writer.writerow(['Unidade', 'Data', 'Kg', 'Total Unidade', 'Erro'])
+        writer.writerow(REPORT_HEADERS)
         
         # Dados
-        for result in results:
-            unit_id = result['unit_id']
-            total = result['total']
-            error = result.get('error', '')
-            
-            if result['rows']:
-                for row in result['rows']:
-                    writer.writerow([
-                        unit_id,
-                        row['date'],
-                        row['kg'],
-                        total,
-                        error
-                    ])
-            else:
-                writer.writerow([unit_id, '', '', total, error])
+        writer.writerows(flatten_results(results))
 
 
 def save_excel(results: list, output_path: Path):
     """Salva resultados em Excel"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Relatório"
+    # Modo write-only: as linhas vão direto para o XML, sem manter objetos Cell em memória
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Relatório")
     
-    # Cabeçalho
-    headers = ['Unidade', 'Data', 'Kg', 'Total Unidade', 'Erro']
-    ws.append(headers)
+    # Ajusta largura das colunas (precisa vir antes da primeira linha)
+    ws.column_dimensions['A'].width = 15
+    ws.column_dimensions['B'].width = 12
+    ws.column_dimensions['C'].width = 10
+    ws.column_dimensions['D'].width = 15
+    ws.column_dimensions['E'].width = 30
     
     # Estilo do cabeçalho
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Font, PatternFill
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
     
-    for cell in ws[1]:
+    # Cabeçalho
+    header = []
+    for title in REPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
         cell.font = header_font
         cell.fill = header_fill
+        header.append(cell)
+    ws.append(header)
     
     # Dados
-    for result in results:
-        unit_id = result['unit_id']
-        total = result['total']
-        error = result.get('error', '')
-        
-        if result['rows']:
-            for row in result['rows']:
-                ws.append([
-                    unit_id,
-                    row['date'],
-                    row['kg'],
-                    total,
-                    error
-                ])
-        else:
-            ws.append([unit_id, '', '', total, error])
-    
-    # Ajusta largura das colunas
-    ws.column_dimensions['A'].width = 15
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 10
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 30
+    for row in flatten_results(results):
+        ws.append(row)
     
     wb.save(output_path)
 
@@ -175,6 +247,7 @@ def main():
     parser.add_argument('--end', required=True, help='Data final (YYYY-MM-DD)')
     parser.add_argument('--format', choices=['csv', 'excel'], default='csv', help='Formato de saída')
     parser.add_argument('--output', help='Caminho do arquivo de saída')
+    parser.add_argument('--workers', type=int, default=1, help='Número de processos de scraping')
     
     args = parser.parse_args()
     
@@ -185,7 +258,8 @@ def main():
         start_date=args.start,
         end_date=args.end,
         output_format=args.format,
-        output_path=args.output
+        output_path=args.output,
+        workers=args.workers
     ))
 
 
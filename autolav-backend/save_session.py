@@ -4,131 +4,552 @@ Script para gerar storage_state.json fazendo login manual no portal
 
 Uso:
     python save_session.py --url <URL_DO_PORTAL> --username <USUARIO> --password <SENHA>
+
+Para gerar várias sessões sem abrir um Chromium a cada chamada, deixe um
+navegador rodando e conecte-se a ele via CDP:
+    chromium --remote-debugging-port=9222
+    python save_session.py --url <URL> --username <USUARIO> --password <SENHA> --cdp-endpoint http://localhost:9222
+
+Ou gere todas as sessões de uma vez, num único navegador:
+    python save_session.py --batch credenciais.json
+
+onde credenciais.json é uma lista de objetos com url, username, password e output.
 """
 import asyncio
 import argparse
 import json
+from functools import reduce
 from pathlib import Path
-from playwright.async_api import async_playwright
+from typing import Optional, Sequence
+from playwright.async_api import async_playwright, BrowserContext, Locator, Page, TimeoutError as PlaywrightTimeout
+
+
+# O login só precisa do formulário; uma janela pequena reduz memória e pintura
+_VIEWPORT = {'width': 800, 'height': 600}
+
+# Seletores de login, do mais específico ao mais genérico (a ordem decide)
+_USER_SELECTORS = (
+    'input[name="username"]', 'input[name="user"]', 'input[id="username"]',
+    'input[placeholder*="usuário"]', 'input[type="text"]'
+)
+_PASS_SELECTORS = (
+    'input[name="password"]', 'input[id="password"]', 'input[type="password"]'
+)
+_SUBMIT_SELECTORS = (
+    'button[type="submit"]', 'input[type="submit"]',
+    'button:has-text("Entrar")', 'button:has-text("Login")'
+)
+
+# Preenche e submete um <form> comum numa única ida ao navegador.
+# Devolve false se os campos não existirem ou não estiverem no mesmo formulário;
+# com checkOnly, só faz essa verificação.
+_FORM_SUBMIT_JS = """([userSelectors, passSelectors, username, password, checkOnly]) => {
+    const pick = selectors => {
+        for (const selector of selectors) {
+            const element = document.querySelector(selector);
+            if (element) return element;
+        }
+        return null;
+    };
+    const user = pick(userSelectors);
+    const pass = pick(passSelectors);
+    if (!user || !pass || !pass.form || user.form !== pass.form) return false;
+    if (checkOnly) return true;
+    for (const [field, value] of [[user, username], [pass, password]]) {
+        field.value = value;
+        field.dispatchEvent(new Event('input', {bubbles: true}));
+        field.dispatchEvent(new Event('change', {bubbles: true}));
+    }
+    const form = pass.form;
+    form.requestSubmit ? form.requestSubmit() : form.submit();
+    return true;
+}"""
+
+
+# Primeiro seletor da lista (na ordem da lista, não do documento) cujo elemento
+# está visível; null faz o wait_for_function continuar tentando. Seletores que
+# o querySelector não entende (ex.: :has-text) são ignorados.
+_FIRST_VISIBLE_JS = """(selectors) => selectors.find(selector => {
+    try {
+        const el = document.querySelector(selector);
+        return el !== null && (el.checkVisibility ? el.checkVisibility() : el.offsetParent !== null);
+    } catch (e) {
+        return false;
+    }
+}) || null"""
 
 
-async def save_session(url: str, username: str, password: str, output_path: str = "./storage/storage_state.json"):
+async def first_visible_selector(page: Page, selectors: Sequence[str], timeout: float = 5000) -> str:
     """
-    Faz login no portal e salva o storage_state
+    Aguarda um dos seletores ficar visível e devolve o primeiro da lista nessa condição
+    
+    Um único probe no navegador (como o _LOGIN_PROBE_JS do scraper): um seletor
+    genérico como input[type="text"] só vence se nenhum específico estiver visível.
     
     Args:
+        page: Página do Playwright
+        selectors: Seletores CSS alternativos, do mais específico ao mais genérico
+        timeout: Tempo máximo em ms para alguma variante aparecer
+    
+    Returns:
+        O seletor escolhido
+    """
+    probe = await page.wait_for_function(_FIRST_VISIBLE_JS, arg=list(selectors), timeout=timeout)
+    return await probe.json_value()
+
+
+def any_locator(page: Page, selectors: Sequence[str]) -> Locator:
+    """
+    Combina os seletores com Locator.or_ e devolve o primeiro elemento encontrado
+    
+    Args:
+        page: Página do Playwright
+        selectors: Seletores alternativos para o mesmo elemento
+    
+    Returns:
+        Locator que resolve para a primeira variante presente na página
+    """
+    return reduce(Locator.or_, (page.locator(selector) for selector in selectors)).first
+
+
+def _is_auth_response(auth_url: str):
+    """Predicado de expect_response: resposta bem-sucedida do endpoint de autenticação"""
+    return lambda response: auth_url in response.url and response.status < 400
+
+
+async def submit_form_post(page: Page, username: str, password: str, auth_url: Optional[str] = None) -> bool:
+    """
+    Preenche e submete o <form> de login num único evaluate
+    
+    Args:
+        page: Página do Playwright
+        username: Nome de usuário
+        password: Senha
+        auth_url: Trecho da URL do endpoint de autenticação; com ele, só retorna
+            depois que esse endpoint responder com sucesso
+    
+    Returns:
+        False se o formulário não foi encontrado (nada foi submetido)
+    """
+    arg = [list(_USER_SELECTORS), list(_PASS_SELECTORS), username, password]
+    if not auth_url:
+        return await page.evaluate(_FORM_SUBMIT_JS, arg + [False])
+    
+    # Confere o formulário antes de armar a espera: sem submit, não haverá resposta alguma
+    if not await page.evaluate(_FORM_SUBMIT_JS, arg + [True]):
+        return False
+    async with page.expect_response(_is_auth_response(auth_url), timeout=30000):
+        await page.evaluate(_FORM_SUBMIT_JS, arg + [False])
+    return True
+
+
+async def fill_login(
+    page: Page,
+    url: str,
+    username: str,
+    password: str,
+    ready_selector: Optional[str] = None,
+    form_post: bool = False,
+    auth_url: Optional[str] = None
+):
+    """
+    Navega até o portal e preenche/submete o formulário de login
+    
+    Args:
+        page: Página do Playwright
         url: URL do portal
         username: Nome de usuário
         password: Senha
+        ready_selector: Elemento que só existe após o login (padrão: o campo de senha sumir)
+        form_post: Tenta preencher e submeter o <form> num único evaluate
+        auth_url: Trecho da URL do endpoint de autenticação; com ele, o login termina
+            na resposta desse endpoint em vez de esperar o marcador de pós-login
+    """
+    print("Navegando para o portal...")
+    # Os campos são aguardados abaixo; não há por que esperar a rede ficar ociosa
+    await page.goto(url, wait_until='domcontentloaded')
+    
+    print("\nProcurando campos de login...")
+    
+    if form_post and await submit_form_post(page, username, password, auth_url):
+        if auth_url:
+            print("Formulário submetido e autenticado")
+        else:
+            print("Formulário preenchido e submetido, aguardando...")
+            await wait_for_post_login(page, ready_selector, timeout=30000)
+        print("Login concluído!")
+        return
+    
+    # Campo de usuário (a variante mais específica visível vence)
+    try:
+        user_selector = await first_visible_selector(page, _USER_SELECTORS)
+        await page.locator(user_selector).first.fill(username, timeout=5000)
+        print(f"Usuário preenchido: {username}")
+    except PlaywrightTimeout:
+        print("Campo de usuário não encontrado")
+    
+    # Campo de senha
+    try:
+        pass_selector = await first_visible_selector(page, _PASS_SELECTORS)
+        await page.locator(pass_selector).first.fill(password, timeout=5000)
+        print("Senha preenchida")
+    except PlaywrightTimeout:
+        print("Campo de senha não encontrado")
+    
+    # Botão de submit: as variantes :has-text só existem no Playwright, então ficam
+    # num locator combinado (todas apontam para o mesmo botão de login)
+    try:
+        submit_btn = any_locator(page, _SUBMIT_SELECTORS)
+        await submit_btn.wait_for(timeout=5000)
+    except PlaywrightTimeout:
+        submit_btn = None
+        print("Botão de login não encontrado")
+    
+    if submit_btn and auth_url:
+        # O login termina quando o endpoint de autenticação responde com sucesso
+        async with page.expect_response(_is_auth_response(auth_url), timeout=30000):
+            await submit_btn.click()
+        print("Login submetido e autenticado")
+    else:
+        if submit_btn:
+            await submit_btn.click()
+            print("Login submetido, aguardando...")
+        
+        # Aguarda um marcador de pós-login em vez da rede ociosa
+        await wait_for_post_login(page, ready_selector, timeout=30000)
+    
+    print("Login concluído!")
+
+
+async def wait_for_post_login(page: Page, ready_selector: Optional[str] = None, timeout: float = 30000):
+    """
+    Aguarda o marcador de pós-login (padrão: o campo de senha sumir)
+    
+    Args:
+        page: Página do Playwright
+        ready_selector: Elemento que só existe após o login
+        timeout: Tempo máximo em ms (0 = sem limite)
+    """
+    if ready_selector:
+        await page.wait_for_selector(ready_selector, timeout=timeout)
+    else:
+        await page.wait_for_selector('input[type="password"]', state='hidden', timeout=timeout)
+
+
+async def wait_for_manual_login(page: Page, ready_selector: Optional[str] = None):
+    """
+    Aguarda o login manual sem bloquear o event loop
+    
+    Termina quando o marcador de pós-login aparece ou quando a aba é fechada. Sem
+    ready_selector, o campo de senha precisa ficar visível e depois sumir.
+    
+    Args:
+        page: Página do Playwright
+        ready_selector: Elemento que só existe após o login
+    """
+    async def logged_in():
+        if not ready_selector:
+            # O campo de senha precisa aparecer antes de sumir: se a página ainda não o
+            # renderizou (ou o login falhou antes dele), 'hidden' resolveria na hora
+            await page.wait_for_selector('input[type="password"]', state='visible', timeout=0)
+        await wait_for_post_login(page, ready_selector, timeout=0)
+    
+    waiters = [
+        asyncio.ensure_future(page.wait_for_event('close', timeout=0)),
+        asyncio.ensure_future(logged_in()),
+    ]
+    _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in pending:
+        waiter.cancel()
+    # Recolhe os resultados (inclusive a espera cancelada) para não deixar exceções órfãs
+    await asyncio.gather(*waiters, return_exceptions=True)
+
+
+def _write_json(output_path: Path, data: dict):
+    """Grava `data` como JSON em `output_path`, criando o diretório se preciso"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+async def write_storage_state(context: BrowserContext, output_path: str) -> Path:
+    """
+    Salva o storage_state do contexto em disco
+    
+    Args:
+        context: Contexto autenticado
         output_path: Caminho para salvar o storage_state.json
+    
+    Returns:
+        Caminho do arquivo salvo
+    """
+    output_path = Path(output_path)
+    storage_state = await context.storage_state()
+    
+    # Serialização e escrita rodam numa thread, sem travar os outros logins do lote
+    await asyncio.get_running_loop().run_in_executor(None, _write_json, output_path, storage_state)
+    
+    return output_path
+
+
+async def save_session(
+    url: str,
+    username: str,
+    password: str,
+    output_path: str = "./storage/storage_state.json",
+    cdp_endpoint: Optional[str] = None,
+    ready_selector: Optional[str] = None,
+    headed: bool = False,
+    profile_dir: Optional[str] = None,
+    form_post: bool = False,
+    auth_url: Optional[str] = None
+):
     """
-    print(f"Iniciando navegador para {url}...")
+    Faz login no portal e salva o storage_state
     
+    Args:
+        url: URL do portal
+        username: Nome de usuário
+        password: Senha
+        output_path: Caminho para salvar o storage_state.json
+        cdp_endpoint: Endpoint CDP de um navegador já aberto (evita um novo launch)
+        ready_selector: Elemento que só existe após o login
+        headed: Abre o navegador visível desde o início
+        profile_dir: Perfil persistente do Chromium (reaproveita cache entre execuções)
+        form_post: Preenche e submete o <form> de login num único evaluate
+        auth_url: Trecho da URL do endpoint de autenticação
+    """
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # headless=False para ver o navegador
-        context = await browser.new_context(
-            viewport={'width': 1920, 'height': 1080}
-        )
-        page = await context.new_page()
+        browser = None
+        
+        async def open_context(headless: bool) -> BrowserContext:
+            nonlocal browser
+            if profile_dir:
+                # Contexto persistente: cache HTTP e service workers ficam no disco entre execuções
+                return await p.chromium.launch_persistent_context(
+                    profile_dir, headless=headless, viewport=_VIEWPORT
+                )
+            browser = await p.chromium.launch(headless=headless)
+            return await browser.new_context(viewport=_VIEWPORT)
         
-        print("Navegando para o portal...")
-        await page.goto(url, wait_until='networkidle')
+        if cdp_endpoint:
+            print(f"Conectando ao navegador em {cdp_endpoint}...")
+            browser = await p.chromium.connect_over_cdp(cdp_endpoint)
+            context = await browser.new_context(viewport=_VIEWPORT)
+        else:
+            print(f"Iniciando navegador para {url}...")
+            context = await open_context(headless=not headed)
         
-        print("\nProcurando campos de login...")
+        page = context.pages[0] if context.pages else await context.new_page()
         
         # Tenta encontrar e preencher campos de login
         try:
-            # Campo de usuário
-            username_selectors = [
-                'input[name="username"]', 'input[name="user"]', 'input[id="username"]',
-                'input[type="text"]', 'input[placeholder*="usuário"]'
-            ]
-            
-            username_field = None
-            for selector in username_selectors:
-                try:
-                    username_field = await page.wait_for_selector(selector, timeout=2000)
-                    if username_field:
-                        print(f"Campo de usuário encontrado: {selector}")
-                        break
-                except:
-                    continue
-            
-            if username_field:
-                await username_field.fill(username)
-                print(f"Usuário preenchido: {username}")
-            
-            # Campo de senha
-            password_selectors = [
-                'input[name="password"]', 'input[id="password"]', 'input[type="password"]'
-            ]
-            
-            password_field = None
-            for selector in password_selectors:
-                try:
-                    password_field = await page.wait_for_selector(selector, timeout=2000)
-                    if password_field:
-                        print(f"Campo de senha encontrado: {selector}")
-                        break
-                except:
-                    continue
-            
-            if password_field:
-                await password_field.fill(password)
-                print("Senha preenchida")
-            
-            # Botão de submit
-            submit_selectors = [
-                'button[type="submit"]', 'input[type="submit"]',
-                'button:has-text("Entrar")', 'button:has-text("Login")'
-            ]
-            
-            for selector in submit_selectors:
-                try:
-                    submit_btn = await page.wait_for_selector(selector, timeout=2000)
-                    if submit_btn:
-                        print(f"Botão de login encontrado: {selector}")
-                        await submit_btn.click()
-                        print("Login submetido, aguardando...")
-                        break
-                except:
-                    continue
-            
-            # Aguarda navegação após login
-            await page.wait_for_load_state('networkidle', timeout=30000)
-            print("Login concluído!")
-            
+            await fill_login(page, url, username, password, ready_selector, form_post, auth_url)
+        
         except Exception as e:
             print(f"Aviso: {e}")
+            
+            if not cdp_endpoint and not headed:
+                # Login manual precisa de uma janela: só neste caso o navegador é reaberto visível
+                print("\nAbrindo navegador visível para login manual...")
+                await (browser or context).close()
+                context = await open_context(headless=False)
+                page = context.pages[0] if context.pages else await context.new_page()
+                await page.goto(url, wait_until='domcontentloaded')
+            
             print("\nSe o login automático falhou, faça login manualmente no navegador.")
-            print("Pressione ENTER após fazer login...")
-            input()
+            print("A sessão será salva assim que o login for detectado (ou ao fechar a aba)...")
+            await wait_for_manual_login(page, ready_selector)
         
         # Salva storage_state
-        output_path = Path(output_path)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path = await write_storage_state(context, output_path)
         
-        storage_state = await context.storage_state()
+        print(f"\n✓ Storage state salvo em: {output_path}")
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(storage_state, f, indent=2, ensure_ascii=False)
+        if cdp_endpoint or profile_dir:
+            # Navegador compartilhado ou perfil persistente: basta fechar o contexto
+            await context.close()
+        else:
+            print("\nVocê pode fechar o navegador agora.")
+            await browser.close()
+
+
+class _RecyclingBrowser:
+    """
+    Browser do modo em lote, trocado por um novo a cada `recycle_every` contextos
+    
+    Contextos em andamento continuam no browser antigo, que só é fechado quando
+    o último deles termina. Isso limita o acúmulo de memória do Chromium em lotes longos.
+    """
+    
+    def __init__(self, playwright, recycle_every: int):
+        self._playwright = playwright
+        self._recycle_every = recycle_every
+        self._lock = asyncio.Lock()
+        self._current = None
+        self._opened = 0
+        # Contextos abertos por browser (o atual e os que aguardam para fechar)
+        self._active = {}
+    
+    async def acquire(self):
+        """Devolve o browser onde o próximo contexto deve ser criado"""
+        async with self._lock:
+            if self._current is None or self._opened >= self._recycle_every:
+                previous = self._current
+                self._current = await self._playwright.chromium.launch(headless=True)
+                self._active[self._current] = 0
+                self._opened = 0
+                if previous is not None and self._active[previous] == 0:
+                    del self._active[previous]
+                    await previous.close()
+            
+            self._opened += 1
+            self._active[self._current] += 1
+            return self._current
+    
+    async def release(self, browser):
+        """Registra o fim de um contexto; fecha o browser antigo quando ele esvazia"""
+        async with self._lock:
+            self._active[browser] -= 1
+            if browser is not self._current and self._active[browser] == 0:
+                del self._active[browser]
+                await browser.close()
+    
+    async def close(self):
+        """Fecha todos os browsers restantes"""
+        async with self._lock:
+            for browser in self._active:
+                await browser.close()
+            self._active.clear()
+            self._current = None
+
+
+async def save_sessions_bulk(
+    creds: list,
+    concurrency: int = 8,
+    cdp_endpoint: Optional[str] = None,
+    ready_selector: Optional[str] = None,
+    form_post: bool = False,
+    auth_url: Optional[str] = None,
+    recycle_every: int = 500
+) -> list:
+    """
+    Gera várias sessões num único navegador, uma BrowserContext por conta
+    
+    Args:
+        creds: Lista de tuplas (url, username, password, output_path)
+        concurrency: Máximo de logins simultâneos
+        cdp_endpoint: Endpoint CDP de um navegador já aberto (evita um novo launch)
+        ready_selector: Elemento que só existe após o login
+        form_post: Preenche e submete o <form> de login num único evaluate
+        auth_url: Trecho da URL do endpoint de autenticação
+        recycle_every: Contextos por browser antes de trocá-lo (ignorado com CDP)
+    
+    Returns:
+        Lista de tuplas (output_path, erro ou None), na ordem de `creds`
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async with async_playwright() as p:
+        if cdp_endpoint:
+            print(f"Conectando ao navegador em {cdp_endpoint}...")
+            shared = await p.chromium.connect_over_cdp(cdp_endpoint)
+            pool = None
+        else:
+            # Sem fallback manual em lote, então não há motivo para abrir janelas
+            print(f"Iniciando navegador para {len(creds)} sessões...")
+            shared = None
+            pool = _RecyclingBrowser(p, recycle_every)
         
-        print(f"\n✓ Storage state salvo em: {output_path}")
-        print("\nVocê pode fechar o navegador agora.")
+        async def worker(url: str, username: str, password: str, output_path: str):
+            async with semaphore:
+                browser = shared or await pool.acquire()
+                try:
+                    context = await browser.new_context(
+                        viewport=_VIEWPORT
+                    )
+                    try:
+                        page = await context.new_page()
+                        await fill_login(page, url, username, password, ready_selector, form_post, auth_url)
+                        saved_path = await write_storage_state(context, output_path)
+                        print(f"✓ {username}: storage state salvo em {saved_path}")
+                        return output_path, None
+                    finally:
+                        await context.close()
+                except Exception as e:
+                    print(f"✗ {username}: {e}")
+                    return output_path, str(e)
+                finally:
+                    if pool:
+                        await pool.release(browser)
         
-        await browser.close()
+        try:
+            # TaskGroup + semáforo: no máximo `concurrency` contextos vivos por vez
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(worker(*cred)) for cred in creds]
+            return [task.result() for task in tasks]
+        finally:
+            if pool:
+                await pool.close()
+
+
+def load_batch(batch_path: str) -> list:
+    """
+    Lê o arquivo de credenciais do modo em lote
+    
+    Args:
+        batch_path: JSON com uma lista de objetos url, username, password e output
+    
+    Returns:
+        Lista de tuplas (url, username, password, output_path)
+    """
+    with open(batch_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    
+    return [
+        (entry['url'], entry['username'], entry['password'], entry['output'])
+        for entry in entries
+    ]
 
 
 def main():
     parser = argparse.ArgumentParser(description="Gera storage_state.json fazendo login no portal")
-    parser.add_argument('--url', required=True, help='URL do portal')
-    parser.add_argument('--username', required=True, help='Nome de usuário')
-    parser.add_argument('--password', required=True, help='Senha')
+    parser.add_argument('--url', help='URL do portal')
+    parser.add_argument('--username', help='Nome de usuário')
+    parser.add_argument('--password', help='Senha')
     parser.add_argument('--output', default='./storage/storage_state.json', help='Caminho de saída')
+    parser.add_argument('--cdp-endpoint', help='Conecta a um navegador já aberto (ex.: http://localhost:9222)')
+    parser.add_argument('--batch', help='JSON com várias contas (url, username, password, output)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Logins simultâneos no modo em lote')
+    parser.add_argument('--recycle-every', type=int, default=500,
+                        help='Contextos por navegador antes de reiniciá-lo no modo em lote')
+    parser.add_argument('--headed', action='store_true', help='Abre o navegador visível desde o início')
+    parser.add_argument('--profile-dir', help='Diretório de perfil persistente do Chromium')
+    parser.add_argument('--form-post', action='store_true',
+                        help='Portal com <form> comum: preenche e submete num único evaluate')
+    parser.add_argument('--auth-url', help='Trecho da URL do endpoint de login (ex.: /auth); conclui na resposta dele')
+    parser.add_argument('--ready-selector', help='Seletor que só existe após o login (padrão: campo de senha sumir)')
     
     args = parser.parse_args()
     
-    asyncio.run(save_session(args.url, args.username, args.password, args.output))
+    if args.batch:
+        results = asyncio.run(save_sessions_bulk(
+            load_batch(args.batch), args.concurrency, args.cdp_endpoint, args.ready_selector,
+            args.form_post, args.auth_url, args.recycle_every
+        ))
+        failed = sum(1 for _, error in results if error)
+        print(f"\n{len(results) - failed}/{len(results)} sessões salvas")
+        return
+    
+    if not (args.url and args.username and args.password):
+        parser.error('--url, --username e --password são obrigatórios sem --batch')
+    if args.profile_dir and args.cdp_endpoint:
+        parser.error('--profile-dir não pode ser usado com --cdp-endpoint')
+    
+    asyncio.run(save_session(
+        args.url, args.username, args.password, args.output, args.cdp_endpoint, args.ready_selector,
+        args.headed, args.profile_dir, args.form_post, args.auth_url
+    ))
 
 
 if __name__ == "__main__":
@@ -2,50 +2,70 @@
 Testes unitários para funções de parsing
 """
 import pytest
-from app.parser import parse_kg, parse_date, filter_rows_by_date, calculate_total, normalize_unit_id
+from datetime import date
+from app.parser import (
+    parse_kg, parse_date, filter_rows_by_date, calculate_total,
+    filter_and_sum, filter_and_sum_columns, normalize_unit_id, validate_date_range
+)
 
 
 class TestParseKg:
     """Testes para parse_kg"""
     
-    def test_parse_kg_simple(self):
-        assert parse_kg("123.45") == 123.45
-        assert parse_kg("123,45") == 123.45
-        assert parse_kg("123") == 123.0
-    
-    def test_parse_kg_with_unit(self):
-        assert parse_kg("123.45 kg") == 123.45
-        assert parse_kg("123,45kg") == 123.45
-        assert parse_kg("123 KG") == 123.0
-    
-    def test_parse_kg_with_thousands(self):
-        assert parse_kg("1.234,56") == 1234.56
-        assert parse_kg("1,234.56") == 1234.56
-    
-    def test_parse_kg_invalid(self):
-        assert parse_kg("") is None
-        assert parse_kg("abc") is None
-        assert parse_kg("-123") is None
-        assert parse_kg(None) is None
+    @pytest.mark.parametrize('text, expected', [
+        # Simples
+        ("123.45", 123.45),
+        ("123,45", 123.45),
+        ("123", 123.0),
+        # Com unidade
+        ("123.45 kg", 123.45),
+        ("123,45kg", 123.45),
+        ("123 KG", 123.0),
+        # Com separador de milhar
+        ("1.234,56", 1234.56),
+        ("1,234.56", 1234.56),
+    ])
+    def test_parse_kg(self, text, expected):
+        assert parse_kg(text) == expected
+    
+    @pytest.mark.parametrize('text', ["", "abc", "-123", None])
+    def test_parse_kg_invalid(self, text):
+        assert parse_kg(text) is None
 
 
 class TestParseDate:
     """Testes para parse_date"""
     
-    def test_parse_date_iso(self):
-        assert parse_date("2025-01-15") == "2025-01-15"
-    
-    def test_parse_date_brazilian(self):
-        assert parse_date("15/01/2025") == "2025-01-15"
-        assert parse_date("15-01-2025") == "2025-01-15"
-    
-    def test_parse_date_with_text(self):
-        assert parse_date("Data: 15/01/2025") == "2025-01-15"
-    
-    def test_parse_date_invalid(self):
-        assert parse_date("") is None
-        assert parse_date("invalid") is None
-        assert parse_date(None) is None
+    @pytest.mark.parametrize('text, expected', [
+        ("2025-01-15", "2025-01-15"),
+        ("15/01/2025", "2025-01-15"),
+        ("15-01-2025", "2025-01-15"),
+        ("Data: 15/01/2025", "2025-01-15"),
+        ("15/01/25", "2025-01-15"),
+    ])
+    def test_parse_date(self, text, expected):
+        assert parse_date(text) == expected
+    
+    @pytest.mark.parametrize('text', ["31/02/2025", "", "invalid", None])
+    def test_parse_date_invalid(self, text):
+        assert parse_date(text) is None
+    
+    def test_parse_date_partial_follows_current_year(self, monkeypatch):
+        import app.parser as parser_module
+        
+        class FakeDate(date):
+            today_value = date(2025, 12, 31)
+            
+            @classmethod
+            def today(cls):
+                return cls.today_value
+        
+        monkeypatch.setattr(parser_module, 'date', FakeDate)
+        assert parse_date("15/01") == "2025-01-15"
+        
+        # Após a virada do ano o cache não pode devolver o resultado antigo
+        FakeDate.today_value = date(2026, 1, 1)
+        assert parse_date("15/01") == "2026-01-15"
 
 
 class TestFilterRowsByDate:
@@ -116,21 +136,74 @@ class TestCalculateTotal:
         assert calculate_total(rows) == 300.0
 
 
+class TestFilterAndSum:
+    """Testes para filter_and_sum"""
+    
+    def test_filter_and_sum_no_dates(self):
+        rows = [
+            {'date': '2025-01-10', 'kg': 100.5},
+            {'date': '2025-01-11', 'kg': 200.3}
+        ]
+        filtered, total = filter_and_sum(rows)
+        assert len(filtered) == 2
+        assert total == 300.8
+    
+    def test_filter_and_sum_date_range(self):
+        rows = [
+            {'date': '2025-01-10', 'kg': 100},
+            {'date': '2025-01-11', 'kg': 200},
+            {'date': '2025-01-12', 'kg': None},
+            {'date': '2025-01-13', 'kg': 400}
+        ]
+        filtered, total = filter_and_sum(rows, start_date='2025-01-11', end_date='2025-01-12')
+        assert [row['date'] for row in filtered] == ['2025-01-11', '2025-01-12']
+        assert total == 200.0
+    
+    def test_filter_and_sum_empty(self):
+        assert filter_and_sum([]) == ([], 0.0)
+    
+    def test_filter_and_sum_columns(self):
+        dates = ['2025-01-10', '2025-01-11', '2025-01-12', '2025-01-13']
+        kgs = [100.0, 200.5, 300.25, 400.0]
+        keep, total = filter_and_sum_columns(dates, kgs, '2025-01-11', '2025-01-12')
+        assert keep == [1, 2]
+        assert total == 500.75
+        assert filter_and_sum_columns(dates, kgs) == ([0, 1, 2, 3], 1000.75)
+        assert filter_and_sum_columns([], []) == ([], 0.0)
+
+
 class TestNormalizeUnitId:
     """Testes para normalize_unit_id"""
     
-    def test_normalize_simple(self):
-        assert normalize_unit_id("101") == "101"
-        assert normalize_unit_id("ABC") == "abc"
+    @pytest.mark.parametrize('unit_id, expected', [
+        ("101", "101"),
+        ("ABC", "abc"),
+        (" 101 ", "101"),
+        ("Unit 101", "unit101"),
+        ("Unit-101", "unit-101"),
+        ("Unit@101", "unit101"),
+        ("", ""),
+        (None, ""),
+    ])
+    def test_normalize(self, unit_id, expected):
+        assert normalize_unit_id(unit_id) == expected
+
+
+class TestValidateDateRange:
+    """Testes para validate_date_range"""
+    
+    def test_validate_iso(self):
+        assert validate_date_range("2025-01-01", "2025-01-31") == ("2025-01-01", "2025-01-31")
+    
+    def test_validate_brazilian(self):
+        assert validate_date_range("01/01/2025", "31/01/2025") == ("2025-01-01", "2025-01-31")
     
-    def test_normalize_with_spaces(self):
-        assert normalize_unit_id(" 101 ") == "101"
-        assert normalize_unit_id("Unit 101") == "unit101"
+    def test_validate_single_date(self):
+        assert validate_date_range("2025-01-15", None) == ("2025-01-15", "2025-01-15")
+        assert validate_date_range(None, "2025-01-15") == ("2025-01-15", "2025-01-15")
     
-    def test_normalize_with_special_chars(self):
-        assert normalize_unit_id("Unit-101") == "unit-101"
-        assert normalize_unit_id("Unit@101") == "unit101"
+    def test_validate_swapped(self):
+        assert validate_date_range("2025-01-31", "2025-01-01") == ("2025-01-01", "2025-01-31")
     
-    def test_normalize_empty(self):
-        assert normalize_unit_id("") == ""
-        assert normalize_unit_id(None) == ""
+    def test_validate_invalid_iso(self):
+        assert validate_date_range("2025-13-45", None) == (None, None)